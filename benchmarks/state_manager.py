@@ -0,0 +1,102 @@
+"""
+Throughput of the state manager's memory backend under concurrent access.
+
+Compares a single-lock dict (the previous StateManager design) with the
+striped MemoryBackend, unbounded and bounded, and with the StateManager
+get/set path over both (change tracking for persistence included), for
+growing thread counts.
+Every operation also hashes a small buffer, which releases the GIL, to stand
+in for the tool work running between state accesses.
+
+    python -m benchmarks.state_manager --threads 1 2 4 8 --seconds 2
+"""
+import argparse
+import hashlib
+import random
+import threading
+import time
+
+from util import state_manager
+from util.state_backends import MemoryBackend
+
+
+class SingleLockBackend:
+    """Every operation, reads included, behind one RLock."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._state = {}
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._state.get(key, default)
+
+    def set(self, key, value):
+        with self._lock:
+            self._state[key] = value
+
+
+def managed(backend):
+    """The process-wide StateManager, switched to ``backend``."""
+    state_manager.use_backend(backend)
+    return state_manager
+
+
+def run(backend, threads: int, seconds: float, keys: int, write_ratio: float, work_bytes: int) -> float:
+    """Operations per second over all threads."""
+    for key in range(keys):
+        backend.set(key, key)
+    payload = b"x" * work_bytes
+    stop = threading.Event()
+    counts = [0] * threads
+
+    def worker(index):
+        rng = random.Random(index)
+        ops = 0
+        while not stop.is_set():
+            for _ in range(100):
+                key = rng.randrange(keys)
+                if rng.random() < write_ratio:
+                    backend.set(key, ops)
+                else:
+                    backend.get(key)
+                if work_bytes:
+                    hashlib.sha256(payload).digest()
+            ops += 100
+        counts[index] = ops
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in workers:
+        thread.join()
+    return sum(counts) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--work-bytes", type=int, default=4096, help="bytes hashed per operation, 0 for none")
+    args = parser.parse_args()
+
+    backends = {
+        "single lock": SingleLockBackend,
+        "striped": MemoryBackend,
+        "striped, bounded": lambda: MemoryBackend(max_entries=args.keys * 2, ttl=3600),
+        "manager": lambda: managed(MemoryBackend()),
+        "manager, bounded": lambda: managed(MemoryBackend(max_entries=args.keys * 2, ttl=3600)),
+    }
+    print(f"{'backend':<18}" + "".join(f"{n:>9} thr" for n in args.threads))
+    for name, factory in backends.items():
+        results = [run(factory(), n, args.seconds, args.keys, args.write_ratio, args.work_bytes)
+                   for n in args.threads]
+        print(f"{name:<18}" + "".join(f"{ops / 1000:>10.0f}k/s" for ops in results))
+
+
+if __name__ == "__main__":
+    main()
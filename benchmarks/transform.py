@@ -0,0 +1,84 @@
+"""
+Latency of data_transformation_tool prompts, deterministic fast path vs pandas agent.
+
+Runs a fixed corpus of prompts over a seeded mock dataset and reports, per
+prompt, whether the fast path answers it and how long it takes. With
+--agent the same prompts also go through the pandas agent (needs
+OPENAI_API_KEY and makes one or more LLM calls per prompt).
+
+    python -m benchmarks.transform --rows-per-day 100 --repeat 20
+"""
+import argparse
+import statistics
+import time
+
+from tools.data import create_agent
+from tools.mocked_data import get_trades_data
+from tools.transform import fast_transform, format_result
+
+CORPUS = [
+    "total net money",
+    "sum net money by month",
+    "average net money per ticker",
+    "max net money by quarter, sorted descending",
+    "median net money for each month",
+    "count trades by month",
+    "how many trades are there?",
+    "number of trades by sec desc",
+    "top 5 trades by net money",
+    "bottom 3 trades by net money",
+    "sort by trade date descending",
+    "trades where net money > 50m",
+    "total net money by year where sec desc contains fund",
+    "top 10 trades by net money where trade date after 2025-01-01",
+    "average net money where net money above 1m and ticker is SEL",
+    "pivot sum net money by month and ticker",
+    "which securities drove the change in net money?",
+    "explain the trend of net money over time",
+]
+
+
+def timed_ms(func, repeat: int) -> float:
+    """Median wall time of ``repeat`` calls in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows-per-day", type=int, default=100, help="mock trades per month-end, 10 months")
+    parser.add_argument("--repeat", type=int, default=20, help="fast path runs per prompt, the median is reported")
+    parser.add_argument("--agent", action="store_true", help="also time the pandas agent, once per prompt")
+    args = parser.parse_args()
+
+    df = get_trades_data("SEL", "2025-05-30", 10, rows_per_day=args.rows_per_day, seed=1)
+    print(f"{len(df)} rows, {len(CORPUS)} prompts\n")
+    print(f"{'prompt':<64}{'fast ms':>10}" + (f"{'agent ms':>12}" if args.agent else ""))
+
+    fast_times, agent_times = [], []
+    for prompt in CORPUS:
+        answered = fast_transform(df, prompt) is not None
+        line = f"{prompt[:62]:<64}"
+        if answered:
+            fast_times.append(timed_ms(lambda: format_result(fast_transform(df, prompt)), args.repeat))
+            line += f"{fast_times[-1]:>10.2f}"
+        else:
+            line += f"{'agent':>10}"
+        if args.agent:
+            agent_times.append(timed_ms(lambda: create_agent(df).invoke({"input": prompt}), 1))
+            line += f"{agent_times[-1]:>12.0f}"
+        print(line)
+
+    print(f"\nfast path coverage: {len(fast_times)}/{len(CORPUS)} prompts")
+    if fast_times:
+        print(f"fast path median:   {statistics.median(fast_times):.2f} ms")
+    if agent_times:
+        print(f"agent median:       {statistics.median(agent_times):.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,112 @@
-from langchain_core.messages import AIMessage, HumanMessage, ToolMessage, SystemMessage
-from langchain_community.tools.tavily_search import TavilySearchResults
+import os
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langgraph.graph import add_messages, StateGraph, END # add_message: to update graph state
-from langgraph.checkpoint.memory import MemorySaver
-from typing import TypedDict, Annotated # to define state of graph
-from langchain_openai import ChatOpenAI
-from tools.data import DataFetchTool, DataTransformationTool
+from langchain_core.runnables import RunnableConfig
+from langchain_core.callbacks.manager import adispatch_custom_event
+from typing import TypedDict, Annotated, Optional # to define state of graph
+from tools.data import BatchDataFetchTool, DataFetchTool, DataTransformationTool, split_batch
 from tools.chart import ChartTool
 from tools.dashboard import DashboardTool
 from tools.report import ReportTool
+from tools.registry import ToolRegistry
+from tools.search import CachedSearchTool
+from tools.datasets import store_dataset
 from util import state_manager
+from util.checkpointer import create_checkpointer
+from util.context import compact_history
+from util.executor import run_blocking
+from util.llm_cache import ResponseCache, tools_fingerprint
+from util.startup import singleton, startup_report, timed
 from dotenv import load_dotenv
 load_dotenv()
 
-search_tool = TavilySearchResults(max_results=1)
-data_tool = DataFetchTool()
-data_query_tool = DataTransformationTool()
-dashboard_tool = DashboardTool()
-chart_tool = ChartTool()
-report_tool = ReportTool()
-
-tools = [search_tool, data_tool, data_query_tool, chart_tool, dashboard_tool, report_tool]
-
-model = ChatOpenAI(model="gpt-4.1")
-
-
-memory = MemorySaver()
-llm_with_tools = model.bind_tools(tools=tools)
+MAX_CONCURRENT_TOOLS = int(os.getenv("MAX_CONCURRENT_TOOLS", "4")) # tool calls run at once per model message
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "120")) # seconds before a single tool call is abandoned
+TOOL_TURN_TIMEOUT = float(os.getenv("TOOL_TURN_TIMEOUT", "0")) or None # seconds for all tool calls of one model message
+DATA_TRANSFORMATION_CONCURRENCY = int(os.getenv("DATA_TRANSFORMATION_CONCURRENCY", "2")) # pandas agent runs at once per process
+CONTEXT_KEEP_TURNS = int(os.getenv("CONTEXT_KEEP_TURNS", "6")) # recent turns sent to the model verbatim
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "24000")) or None # approximate prompt token budget
+CONTEXT_TOOL_CHARS = int(os.getenv("CONTEXT_TOOL_CHARS", "500")) # characters kept from older tool results
+LLM_CACHE = os.getenv("LLM_CACHE", "false").lower() == "true" # reuse model responses for identical conversations
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512")) # responses kept in memory
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "900")) # seconds a cached response stays valid
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "llm_cache.sqlite") # on-disk tier, empty for memory only
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "300")) # seconds a web search result is reused
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "256")) # web search results kept
+
+# Events the chat renders from astream_events: model tokens, tool runs and cached model turns
+STREAM_EVENT_TYPES = ["chat_model", "tool"]
+STREAM_EVENT_NAMES = ["model_cache_hit"]
+
+# Tool handlers, these turn a tool's output into the ToolMessage content
+
+async def search_handler(tool, tool_args):
+    search_results = await tool.ainvoke(tool_args)
+    return str(search_results)
+
+# Datasets are stored on the tool executor, shared state backends pickle and write them
+
+async def data_fetch_handler(tool, tool_args):
+    df = await tool.ainvoke(tool_args)
+    await run_blocking(store_dataset, tool_args["port"], tool_args["report_date"], df)
+    return tool_args
+
+def store_batch(trade_data, ports, report_dates):
+    for (port, report_date), df in split_batch(trade_data, ports, report_dates).items():
+        store_dataset(port, report_date, df)
+
+async def batch_data_fetch_handler(tool, tool_args):
+    trade_data = await tool.ainvoke(tool_args)
+    await run_blocking(store_batch, trade_data, tool_args["ports"], tool_args["report_dates"])
+    return tool_args
+
+# Process-wide singletons, built on first use so importing this module stays cheap
+
+@singleton("tool registry")
+def get_registry() -> ToolRegistry:
+    """Tool registry, adding a tool only takes a registration here."""
+    with timed("import langchain_community.tools.tavily_search"):
+        from langchain_community.tools.tavily_search import TavilySearchResults
+        
+    search_tool = CachedSearchTool.from_tool(
+        TavilySearchResults(max_results=1), ttl=SEARCH_CACHE_TTL, max_entries=SEARCH_CACHE_SIZE
+    )
+    registry = ToolRegistry(default_timeout=TOOL_TIMEOUT)
+    registry.register(search_tool, handler=search_handler)
+    registry.register(DataFetchTool(), handler=data_fetch_handler)
+    registry.register(BatchDataFetchTool(), handler=batch_data_fetch_handler)
+    registry.register(DataTransformationTool(), max_concurrency=DATA_TRANSFORMATION_CONCURRENCY)
+    registry.register(ChartTool())
+    registry.register(DashboardTool())
+    registry.register(ReportTool(), max_concurrency=1) # the report is always written to report.pdf
+    return registry
+
+def get_tools():
+    return get_registry().tools()
+
+@singleton("chat model")
+def get_model():
+    with timed("import langchain_openai"):
+        from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model="gpt-4.1")
+
+@singleton("bound chat model")
+def get_llm_with_tools():
+    return get_model().bind_tools(tools=get_tools())
+
+@singleton("checkpointer")
+def get_checkpointer():
+    return create_checkpointer() # CHECKPOINT_BACKEND=memory|sqlite
+
+@singleton("response cache")
+def get_response_cache() -> Optional[ResponseCache]:
+    if not LLM_CACHE:
+        return None
+    return ResponseCache(max_entries=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL, path=LLM_CACHE_DB or None)
+
+@singleton("response cache salt")
+def get_llm_cache_salt() -> str:
+    return tools_fingerprint(get_tools(), get_model().model_name)
 
 # Graph State
 
@@ -34,85 +115,64 @@ class State(TypedDict):
 
 # Defining Nodes
 
-async def model(state: State):
+async def model(state: State, config: RunnableConfig):
+    """Call the LLM on a bounded window of the conversation.
+
+    The window keeps the system prompt and the last ``context_keep_turns``
+    turns verbatim, compacts older tool results and fits ``context_max_tokens``.
+    All three settings can be overridden through ``config["configurable"]``.
+    When LLM_CACHE is enabled, identical windows are answered from the
+    response cache without calling the model.
+    """
     messages = state["messages"]
     if isinstance(messages[-1], SystemMessage):
         return state
-    result = await llm_with_tools.ainvoke(state["messages"])
+    configurable = config.get("configurable", {})
+    messages = compact_history(
+        messages,
+        keep_turns=configurable.get("context_keep_turns", CONTEXT_KEEP_TURNS),
+        max_tokens=configurable.get("context_max_tokens", CONTEXT_MAX_TOKENS),
+        max_tool_chars=configurable.get("context_tool_chars", CONTEXT_TOOL_CHARS)
+    )
+
+    response_cache = get_response_cache()
+    if response_cache is not None:
+        cache_key = response_cache.key(messages, salt=get_llm_cache_salt())
+        cached = await response_cache.aget(cache_key)
+        if cached is not None:
+            # no model events are emitted for a cached turn, the UI renders this event instead.
+            # The payload must be a dict: filtered astream_events writes the run input into it
+            await adispatch_custom_event("model_cache_hit", {"message": cached}, config=config)
+            return {"messages": [cached]}
+
+    result = await get_llm_with_tools().ainvoke(messages)
+    if response_cache is not None:
+        await response_cache.aset(cache_key, result)
     return {
         "messages": [result], 
     }
 
-async def tool_node(state):
-    """Custom tool node that handles tool calls from the LLM."""
-    
+async def tool_node(state, config: RunnableConfig):
+    """Custom tool node that handles tool calls from the LLM.
+
+    Tool calls from one model message are dispatched through the tool registry
+    and run concurrently, at most ``max_concurrent_tools`` at a time, each call
+    bounded by ``tool_timeout`` seconds once it starts. The whole batch is
+    cancelled after ``tool_turn_timeout`` seconds when it is set. All three can
+    be overridden per run through ``config["configurable"]``.
+    ToolMessages are returned in the original call order.
+    Tools read and write the state manager in the namespace of the chat thread.
+    """
+
     tool_calls = state["messages"][-1].tool_calls # Get the tool calls from the last message
-    tool_messages = [] # Initialize list to store tool messages
-    
-    for tool_call in tool_calls:
-        tool_name = tool_call["name"]
-        tool_args = tool_call["args"]
-        tool_id = tool_call["id"]
-        
-        # Handle the search tool
-        if tool_name == "tavily_search_results_json":
-            search_results = await search_tool.ainvoke(tool_args)
-            
-            tool_message = ToolMessage(
-                content=str(search_results),
-                tool_call_id=tool_id,
-                name=tool_name
-            )
-            
-            tool_messages.append(tool_message)
-
-        if tool_name == "data_fetch_tool":
-            df = await data_tool.ainvoke(tool_args)
-            tool_message = ToolMessage(
-                content=tool_args,
-                tool_call_id=tool_id,
-                name=tool_name
-            )
-            data_id = repr(tool_args)
-            state_manager.set(data_id, df)
-
-            tool_messages.append(tool_message)
-            
-        if tool_name == "data_transformation_tool":
-            response = await data_query_tool.ainvoke(tool_args)
-            tool_message = ToolMessage(
-                content=response,
-                tool_call_id=tool_id,
-                name=tool_name
-            )
-            tool_messages.append(tool_message)
-        
-        if tool_name == "chart_tool":
-            response = await chart_tool.ainvoke(tool_args)
-            tool_message = ToolMessage(
-                content = response,
-                tool_call_id=tool_id,
-                name=tool_name
-            )
-            tool_messages.append(tool_message)
-        
-        if tool_name == "dashboard_tool":
-            response = await dashboard_tool.ainvoke(tool_args)
-            tool_message = ToolMessage(
-                content = response,
-                tool_call_id=tool_id,
-                name=tool_name
-            )
-            tool_messages.append(tool_message)
-
-        if tool_name == "report_tool":
-            response = await report_tool.ainvoke(tool_args)
-            tool_message = ToolMessage(
-                content = response,
-                tool_call_id=tool_id,
-                name=tool_name
-            )
-            tool_messages.append(tool_message)
+    configurable = config.get("configurable", {})
+    with state_manager.scope(configurable.get("thread_id")):
+        tool_messages = await get_registry().dispatch_all(
+            tool_calls,
+            max_concurrent=configurable.get("max_concurrent_tools", MAX_CONCURRENT_TOOLS),
+            timeout=configurable.get("tool_turn_timeout", TOOL_TURN_TIMEOUT),
+            call_timeout=configurable.get("tool_timeout")
+        )
     return {"messages": tool_messages}
 
 # Router
@@ -125,22 +185,61 @@ async def tools_router(state: State):
     return END
 
 # Building graph
-class Graph:
-    def __init__(self):
-        graph_builder = StateGraph(State)
 
-        # adding nodes
-        graph_builder.add_node("model", model)
-        graph_builder.add_node("tool_node", tool_node)
+@singleton("compiled graph")
+def get_graph():
+    graph_builder = StateGraph(State)
+
+    # adding nodes
+    graph_builder.add_node("model", model)
+    graph_builder.add_node("tool_node", tool_node)
+
+    graph_builder.set_entry_point("model")
 
-        graph_builder.set_entry_point("model")
+    # adding edges
+    graph_builder.add_conditional_edges("model", tools_router)
+    graph_builder.add_edge("tool_node", "model")
 
-        # adding edges
-        graph_builder.add_conditional_edges("model", tools_router)
-        graph_builder.add_edge("tool_node", "model")
+    return graph_builder.compile(checkpointer=get_checkpointer())
+
+class Graph:
+    """Handle on the process-wide compiled graph, cheap to create on every Streamlit rerun."""
+
+    def __init__(self):
+        self.graph = get_graph()
 
-        self.graph = graph_builder.compile(checkpointer=memory)
-    
     def get(self):
         return self.graph
-    
\ No newline at end of file
+
+    @staticmethod
+    def turn_input(prompt: str, system_prompt: Optional[str] = None) -> dict:
+        """Graph input for one user turn.
+
+        Pass ``system_prompt`` on the first turn of a thread: the system message
+        is written together with the user message, so opening a thread takes
+        no separate graph execution or checkpoint.
+        """
+        messages = [HumanMessage(content=prompt)]
+        if system_prompt is not None:
+            messages.insert(0, SystemMessage(content=system_prompt))
+        return {"messages": messages}
+
+
+if __name__ == "__main__":
+    import argparse
+    import importlib
+
+    parser = argparse.ArgumentParser(description="FolioPilot chat graph")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="build the graph and print the cost of each import and construction step")
+    args = parser.parse_args()
+
+    if args.startup_report:
+        get_graph()
+        get_llm_with_tools()
+        get_response_cache()
+        # optional dependencies that are only imported when a turn charts, reports or transforms data
+        for module in ("langchain_experimental.agents.agent_toolkits", "fpdf", "matplotlib.pyplot", "seaborn"):
+            with timed(f"import {module} (deferred)"):
+                importlib.import_module(module)
+        print(startup_report())
@@ -1,10 +1,11 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import datetime
 
 def dashboard_ui(port = st.session_state.get("dashboard_portfolio")):    
+    import matplotlib.pyplot as plt # deferred until the dashboard is opened
+
     if st.button("Close"):
         st.session_state["view_dashboard"] = False
         st.rerun()
@@ -0,0 +1,73 @@
+import sqlite3
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import END, StateGraph
+
+import chatgraph
+from util.checkpointer import SqliteCheckpointer
+
+
+def echo_graph(checkpointer):
+    def echo(state):
+        return {"messages": [AIMessage(content=f"echo {state['messages'][-1].content}")]}
+
+    builder = StateGraph(chatgraph.State)
+    builder.add_node("echo", echo)
+    builder.set_entry_point("echo")
+    builder.add_edge("echo", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def stored_checkpoints(path) -> int:
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+
+
+def test_threads_are_recovered_by_a_new_checkpointer(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    config = {"configurable": {"thread_id": "thread-1"}}
+    checkpointer = SqliteCheckpointer(path)
+    echo_graph(checkpointer).invoke({"messages": [HumanMessage(content="hello")]}, config)
+    checkpointer.close()
+
+    state = echo_graph(SqliteCheckpointer(path)).get_state(config)
+
+    assert [message.content for message in state.values["messages"]] == ["hello", "echo hello"]
+
+
+def test_only_the_last_checkpoints_of_a_thread_are_kept(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    checkpointer = SqliteCheckpointer(path, keep_last=3, batch_size=1)
+    graph = echo_graph(checkpointer)
+    config = {"configurable": {"thread_id": "thread-1"}}
+    for turn in range(5):
+        graph.invoke({"messages": [HumanMessage(content=str(turn))]}, config)
+
+    assert stored_checkpoints(path) == 3
+    assert len(graph.get_state(config).values["messages"]) == 10
+
+
+def test_pending_writes_are_flushed_while_idle(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    checkpointer = SqliteCheckpointer(path, batch_size=1000, flush_interval=0.1)
+    echo_graph(checkpointer).invoke({"messages": [HumanMessage(content="hello")]},
+                                    {"configurable": {"thread_id": "thread-1"}})
+    assert stored_checkpoints(path) == 0
+
+    time.sleep(0.4)  # no further writes or reads, only the timer can flush
+
+    assert stored_checkpoints(path) > 0
+
+
+def test_delete_thread_removes_its_checkpoints(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    checkpointer = SqliteCheckpointer(path)
+    graph = echo_graph(checkpointer)
+    for thread_id in ("keep", "drop"):
+        graph.invoke({"messages": [HumanMessage(content="hello")]}, {"configurable": {"thread_id": thread_id}})
+
+    checkpointer.delete_thread("drop")
+
+    assert not graph.get_state({"configurable": {"thread_id": "drop"}}).values
+    assert graph.get_state({"configurable": {"thread_id": "keep"}}).values
@@ -0,0 +1,68 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from util.context import compact_history, split_turns
+
+
+def tool_turn(n: int, result: str = "x" * 2000) -> list:
+    call_id = f"call_{n}"
+    return [
+        HumanMessage(content=f"question {n}"),
+        AIMessage(content="", tool_calls=[{"name": "data_fetch_tool", "args": {"port": "SEL"}, "id": call_id}]),
+        ToolMessage(content=result, name="data_fetch_tool", tool_call_id=call_id),
+        AIMessage(content=f"answer {n}"),
+    ]
+
+
+def history(turns: int) -> list:
+    return [SystemMessage(content="You are FolioPilot.")] + [m for n in range(turns) for m in tool_turn(n)]
+
+
+def test_tool_results_stay_in_the_turn_of_their_call():
+    turns = split_turns(history(3)[1:])
+
+    assert len(turns) == 3
+    for turn in turns:
+        assert isinstance(turn[0], HumanMessage)
+        call, result = turn[1], turn[2]
+        assert result.tool_call_id == call.tool_calls[0]["id"]
+
+
+def test_leading_messages_without_a_user_message_form_a_turn():
+    turns = split_turns([AIMessage(content="hello"), HumanMessage(content="hi")])
+    assert [len(turn) for turn in turns] == [1, 1]
+
+
+def test_only_turns_older_than_keep_turns_are_compacted():
+    messages = compact_history(history(4), keep_turns=2, max_tokens=None, max_tool_chars=100)
+
+    results = [message for message in messages if isinstance(message, ToolMessage)]
+    assert [len(result.content) < 200 for result in results] == [True, True, False, False]
+    assert results[0].content.startswith("[data_fetch_tool result compacted, 2000 chars]")
+    assert len(messages) == len(history(4))
+
+
+def test_short_tool_results_are_left_alone():
+    messages = history(1)[:1] + tool_turn(0, "small") + tool_turn(1)
+    compacted = compact_history(messages, keep_turns=1, max_tokens=None, max_tool_chars=100)
+    assert compacted[3] is messages[3]
+
+
+def test_budget_drops_the_oldest_turns_and_keeps_the_system_message():
+    messages = history(6)
+    compacted = compact_history(messages, keep_turns=6, max_tokens=1200, max_tool_chars=100)
+
+    assert isinstance(compacted[0], SystemMessage)
+    questions = [message.content for message in compacted if isinstance(message, HumanMessage)]
+    assert questions and questions[-1] == "question 5"
+    assert questions == [f"question {n}" for n in range(6 - len(questions), 6)]
+    assert len(questions) < 6
+    # whole turns are dropped, never a tool call without its result
+    calls = {m.tool_calls[0]["id"] for m in compacted if isinstance(m, AIMessage) and m.tool_calls}
+    results = {m.tool_call_id for m in compacted if isinstance(m, ToolMessage)}
+    assert calls == results
+
+
+def test_latest_turn_is_kept_over_budget():
+    compacted = compact_history(history(3), keep_turns=1, max_tokens=10)
+    assert [type(message) for message in compacted] == [SystemMessage, HumanMessage, AIMessage, ToolMessage, AIMessage]
+    assert compacted[1].content == "question 2"
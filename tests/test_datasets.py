@@ -0,0 +1,64 @@
+import datetime
+from collections import OrderedDict
+
+import pandas as pd
+import pytest
+
+from tools import datasets
+from tools.datasets import DatasetKey, dataset_stats, load_dataset, store_dataset
+from util.state_manager import StateManager
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch, tmp_path):
+    monkeypatch.setattr(StateManager, "_persist_dir", str(tmp_path / "state"))
+    monkeypatch.setattr(StateManager, "_instance", None)
+    monkeypatch.setattr(datasets, "state_manager", StateManager())
+    monkeypatch.setattr(datasets, "_counters", {"hits": 0, "misses": 0, "mismatch_hits": 0})
+    monkeypatch.setattr(datasets, "_aliases", OrderedDict())
+
+
+def test_keys_are_normalized():
+    key = DatasetKey.of(" sel agg ", "2025-05-30")
+    assert key == DatasetKey.of("SEL_AGG", datetime.datetime(2025, 5, 30, 12))
+    assert key == DatasetKey.of("Sel-Agg", pd.Timestamp("2025-05-30"))
+    assert key == DatasetKey.from_args({"port": "sel-agg", "report_date": "May 30 2025", "prompt": "sum"})
+    assert str(key) == "dataset:SEL-AGG:2025-05-30"
+
+
+def test_lookup_counters():
+    df = pd.DataFrame({"Net Money": [1.0]})
+    store_dataset("SEL", "2025-05-30", df)
+
+    assert load_dataset("SEL", "2025-05-30") is df
+    assert load_dataset("sel", "2025-05-30") is df  # the raw repr key would have missed
+    assert load_dataset("SEL", "2025-04-30") is None
+
+    stats = dataset_stats()
+    assert (stats["hits"], stats["misses"], stats["mismatch_hits"]) == (2, 1, 1)
+    assert stats["raw_key_hit_rate"] == pytest.approx(1 / 3)
+
+
+def test_remembered_spellings_are_bounded(monkeypatch):
+    monkeypatch.setattr(datasets, "_ALIASED_KEYS", 3)
+    df = pd.DataFrame({"Net Money": [1.0]})
+    for port in ("A", "B", "C", "A", "D"):
+        store_dataset(port, "2025-05-30", df)
+    assert [key.port for key in datasets._aliases] == ["C", "A", "D"]
+
+
+def test_batch_pairs_without_trades_are_stored_empty():
+    import chatgraph
+    from tools.mocked_data import TRADE_COLUMNS
+
+    trades = pd.DataFrame({column: ["x"] for column in TRADE_COLUMNS}).assign(
+        Ticker="SEL", **{"Report Date": datetime.date(2025, 5, 30)})
+    dates = [datetime.date(2025, 5, 30), datetime.date(2025, 6, 30)]
+
+    chatgraph.store_batch(trades, ["sel", "AGG"], dates)
+
+    assert len(load_dataset("SEL", "2025-05-30")) == 1
+    for port, report_date in [("SEL", "2025-06-30"), ("AGG", "2025-05-30"), ("AGG", "2025-06-30")]:
+        empty = load_dataset(port, report_date)
+        assert empty is not None and empty.empty
+        assert list(empty.columns) == TRADE_COLUMNS
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+
+import pytest
+
+from util.event_loop import BackgroundLoop
+
+
+@pytest.fixture
+def background():
+    background = BackgroundLoop(name="test-loop")
+    yield background
+    background.stop()
+
+
+def test_run_executes_on_the_loop_thread(background):
+    async def thread_name():
+        return threading.current_thread().name
+
+    assert background.run(thread_name(), timeout=5) == "test-loop"
+
+
+def test_stream_yields_items_in_order(background):
+    async def numbers():
+        for n in range(5):
+            await asyncio.sleep(0)
+            yield n
+
+    assert list(background.stream(numbers(), timeout=5)) == [0, 1, 2, 3, 4]
+
+
+def test_stream_reraises_generator_errors(background):
+    async def failing():
+        yield "first"
+        raise ValueError("upstream failed")
+
+    items = background.stream(failing(), timeout=5)
+    assert next(items) == "first"
+    with pytest.raises(ValueError, match="upstream failed"):
+        next(items)
+
+
+def test_stopping_early_cancels_the_producer(background):
+    cancelled = threading.Event()
+
+    async def endless():
+        try:
+            n = 0
+            while True:
+                yield n
+                n += 1
+                await asyncio.sleep(0.001)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    for n in background.stream(endless(), timeout=5):
+        if n == 3:
+            break
+
+    assert cancelled.wait(5)
@@ -0,0 +1,122 @@
+import asyncio
+
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langgraph.graph import END, StateGraph
+
+import chatgraph
+from util.llm_cache import ResponseCache
+
+
+def conversation(suffix: str = "") -> list:
+    return [
+        SystemMessage(content="You are FolioPilot."),
+        HumanMessage(content="Show me the performance data of SEL-AGG." + suffix, id="run-1"),
+    ]
+
+
+def test_key_ignores_ids_and_whitespace():
+    first = conversation()
+    second = [SystemMessage(content="You are  FolioPilot. "),
+              HumanMessage(content="Show me the performance data of SEL-AGG.", id="run-2")]
+
+    assert ResponseCache.key(first, salt="a") == ResponseCache.key(second, salt="a")
+    assert ResponseCache.key(first, salt="a") != ResponseCache.key(first, salt="b")
+    assert ResponseCache.key(first) != ResponseCache.key(conversation(" Thanks"))
+
+
+def test_tool_results_are_part_of_the_key():
+    call = AIMessage(content="", tool_calls=[{"name": "data_fetch_tool", "args": {"port": "SEL"}, "id": "1"}])
+    fetched = conversation() + [call, ToolMessage(content="2025-05-30", tool_call_id="1")]
+    other = conversation() + [call, ToolMessage(content="2025-04-30", tool_call_id="1")]
+
+    assert ResponseCache.key(fetched) != ResponseCache.key(other)
+
+
+def test_cached_responses_get_fresh_ids():
+    cache = ResponseCache()
+    message = AIMessage(content="", id="run-1",
+                        tool_calls=[{"name": "data_fetch_tool", "args": {"port": "SEL"}, "id": "call_1"}])
+    cache.set("key", message)
+
+    first, second = cache.get("key"), cache.get("key")
+
+    assert first.tool_calls[0]["args"] == {"port": "SEL"}
+    assert first.id is None
+    assert first.tool_calls[0]["id"] != second.tool_calls[0]["id"] != "call_1"
+
+
+def test_expired_entries_miss():
+    cache = ResponseCache(ttl=0)
+    cache.set("key", AIMessage(content="hello"))
+
+    assert cache.get("key") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_memory_tier_is_bounded():
+    cache = ResponseCache(max_entries=2)
+    for key in "abc":
+        cache.set(key, AIMessage(content=key))
+
+    assert cache.get("a") is None
+    assert cache.get("c").content == "c"
+
+
+def test_disk_tier_is_shared_by_instances(tmp_path):
+    path = str(tmp_path / "llm_cache.sqlite")
+    ResponseCache(path=path).set("key", AIMessage(content="from disk"))
+    cache = ResponseCache(path=path)
+
+    assert asyncio.run(cache.aget("key")).content == "from disk"
+    assert cache.get("key").content == "from disk"
+    assert cache.stats() == {"memory_hits": 1, "disk_hits": 1, "misses": 0, "hit_rate": 1.0}
+
+
+def test_async_set_writes_both_tiers(tmp_path):
+    path = str(tmp_path / "llm_cache.sqlite")
+    asyncio.run(ResponseCache(path=path).aset("key", AIMessage(content="hello")))
+
+    assert ResponseCache(path=path).get("key").content == "hello"
+
+
+def test_expired_rows_are_deleted_from_disk(tmp_path):
+    path = str(tmp_path / "llm_cache.sqlite")
+    cache = ResponseCache(ttl=0, path=path, purge_every=3)
+
+    async def write(count):
+        for n in range(count):
+            await cache.aset(f"key{n}", AIMessage(content="old"))
+
+    asyncio.run(write(2))
+    assert cache._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 2
+    asyncio.run(write(1))  # the third write purges
+    assert cache._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 0
+
+    ResponseCache(ttl=0, path=path).set("stale", AIMessage(content="old"))
+    assert ResponseCache(path=path)._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 0
+
+
+def model_graph():
+    builder = StateGraph(chatgraph.State)
+    builder.add_node("model", chatgraph.model)
+    builder.set_entry_point("model")
+    builder.add_edge("model", END)
+    return builder.compile()
+
+
+def test_model_node_answers_repeated_conversations_from_the_cache(monkeypatch):
+    fake = FakeMessagesListChatModel(responses=[AIMessage(content="first answer"), AIMessage(content="second answer")])
+    cache = ResponseCache()
+    monkeypatch.setattr(chatgraph, "get_llm_with_tools", lambda: fake)
+    monkeypatch.setattr(chatgraph, "get_response_cache", lambda: cache)
+    monkeypatch.setattr(chatgraph, "get_llm_cache_salt", lambda: "test")
+    graph = model_graph()
+
+    first = asyncio.run(graph.ainvoke({"messages": conversation()}))
+    second = asyncio.run(graph.ainvoke({"messages": conversation()}))
+
+    assert first["messages"][-1].content == "first answer"
+    assert second["messages"][-1].content == "first answer"  # the fake model would answer "second answer"
+    assert fake.i == 1
+    assert cache.stats()["memory_hits"] == 1
@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+from langchain_core.tools import StructuredTool
+
+from tools.registry import ToolRegistry
+
+
+def sleeping_tool(name: str, log: list = None) -> StructuredTool:
+    async def sleep(seconds: float) -> str:
+        if log is not None:
+            log.append(("start", name, time.perf_counter()))
+        await asyncio.sleep(seconds)
+        return f"{name} slept {seconds}"
+
+    return StructuredTool.from_function(coroutine=sleep, name=name, description=f"{name} sleeps")
+
+
+def call(name: str, seconds: float, call_id: str) -> dict:
+    return {"name": name, "args": {"seconds": seconds}, "id": call_id}
+
+
+def test_results_keep_call_order_and_run_concurrently():
+    registry = ToolRegistry()
+    registry.register(sleeping_tool("sleep"))
+    calls = [call("sleep", 0.2, "a"), call("sleep", 0.05, "b"), call("sleep", 0.1, "c")]
+
+    start = time.perf_counter()
+    messages = asyncio.run(registry.dispatch_all(calls))
+
+    assert time.perf_counter() - start < 0.35
+    assert [message.tool_call_id for message in messages] == ["a", "b", "c"]
+    assert messages[0].content == "sleep slept 0.2"
+
+
+def test_unknown_and_failing_tools_answer_with_an_error():
+    async def fail(seconds: float) -> str:
+        raise RuntimeError("boom")
+
+    registry = ToolRegistry()
+    registry.register(StructuredTool.from_function(coroutine=fail, name="fail", description="fails"))
+    messages = asyncio.run(registry.dispatch_all([call("missing", 0, "a"), call("fail", 0, "b")]))
+
+    assert [message.status for message in messages] == ["error", "error"]
+    assert "Unknown tool missing" in messages[0].content
+    assert "boom" in messages[1].content
+
+
+def test_duplicate_registration_is_rejected():
+    registry = ToolRegistry()
+    registry.register(sleeping_tool("sleep"))
+    try:
+        registry.register(sleeping_tool("sleep"))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("registering the same name twice must fail")
+
+
+def test_max_concurrency_limits_runs_of_one_tool():
+    log = []
+    registry = ToolRegistry()
+    registry.register(sleeping_tool("slow", log), max_concurrency=1)
+    calls = [call("slow", 0.1, str(i)) for i in range(3)]
+
+    asyncio.run(registry.dispatch_all(calls))
+
+    starts = sorted(at for _, _, at in log)
+    assert all(later - earlier >= 0.09 for earlier, later in zip(starts, starts[1:]))
+
+
+def test_tool_timeout_does_not_count_time_queued_on_the_semaphore():
+    registry = ToolRegistry(default_timeout=0.15)
+    registry.register(sleeping_tool("slow"), max_concurrency=1)
+    # each call runs 0.1 s, well within its timeout, but the third one waits 0.2 s for a slot
+    messages = asyncio.run(registry.dispatch_all([call("slow", 0.1, str(i)) for i in range(3)]))
+
+    assert [message.status for message in messages] == ["success"] * 3
+
+
+def test_call_timeout_overrides_the_registered_timeout():
+    registry = ToolRegistry(default_timeout=10)
+    registry.register(sleeping_tool("slow"), timeout=10)
+
+    messages = asyncio.run(registry.dispatch_all([call("slow", 1, "a")], call_timeout=0.05))
+
+    assert messages[0].status == "error"
+    assert "timed out after 0.1 seconds" in messages[0].content
+
+
+def test_turn_deadline_cancels_queued_and_running_calls():
+    registry = ToolRegistry()
+    registry.register(sleeping_tool("slow"), max_concurrency=1)
+    calls = [call("slow", 0.1, "a"), call("slow", 0.1, "b"), call("slow", 0.1, "c")]
+
+    start = time.perf_counter()
+    messages = asyncio.run(registry.dispatch_all(calls, timeout=0.15))
+
+    assert time.perf_counter() - start < 0.3
+    assert [message.status for message in messages] == ["success", "error", "error"]
@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+from langchain_core.tools import StructuredTool
+
+from tools.search import CachedSearchTool, SearchBackend, SearchCache
+
+
+class StubBackend(SearchBackend):
+    """Counts upstream requests, each one takes ``delay`` seconds."""
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.queries = []
+
+    async def search(self, query):
+        self.queries.append(query)
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return [{"content": f"news about {query}"}]
+
+
+def test_normalized_queries_share_a_cached_result():
+    backend = StubBackend()
+    cache = SearchCache(backend)
+
+    async def run():
+        await cache.search("SEL-AGG  news")
+        return await cache.search("sel-agg news")
+
+    assert asyncio.run(run()) == [{"content": "news about SEL-AGG  news"}]
+    assert backend.queries == ["SEL-AGG  news"]
+    assert cache.stats() == {"hits": 1, "misses": 1, "coalesced": 0, "entries": 1}
+
+
+def test_concurrent_identical_queries_make_one_request():
+    backend = StubBackend(delay=0.05)
+    cache = SearchCache(backend)
+
+    async def run():
+        return await asyncio.gather(*(cache.search("market news") for _ in range(5)))
+
+    results = asyncio.run(run())
+
+    assert len(backend.queries) == 1
+    assert all(result == results[0] for result in results)
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_expired_results_are_fetched_again():
+    backend = StubBackend()
+    cache = SearchCache(backend, ttl=0)
+
+    async def run():
+        await cache.search("market news")
+        await cache.search("market news")
+
+    asyncio.run(run())
+
+    assert len(backend.queries) == 2
+
+
+def test_cache_is_bounded():
+    backend = StubBackend()
+    cache = SearchCache(backend, max_entries=2)
+
+    async def run():
+        for query in ("a", "b", "c", "a"):
+            await cache.search(query)
+
+    asyncio.run(run())
+
+    assert backend.queries == ["a", "b", "c", "a"]
+    assert cache.stats()["entries"] == 2
+
+
+def test_failures_reach_every_waiter_and_are_not_cached():
+    backend = StubBackend(delay=0.05, fail=True)
+    cache = SearchCache(backend)
+
+    async def run():
+        return await asyncio.gather(*(cache.search("market news") for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    backend.fail = False
+    assert asyncio.run(cache.search("market news")) == [{"content": "news about market news"}]
+    assert len(backend.queries) == 2
+
+
+def test_error_strings_from_the_wrapped_tool_are_not_cached():
+    calls = []
+
+    async def search(query: str):
+        calls.append(query)
+        return "HTTPError('429 Too Many Requests')"
+
+    tool = CachedSearchTool.from_tool(StructuredTool.from_function(coroutine=search, name="search", description="search"))
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            asyncio.run(tool.ainvoke({"query": "market news"}))
+
+    assert len(calls) == 2
+    assert tool.name == "search"
+
+
+def test_cancelling_the_first_caller_does_not_cancel_the_others():
+    backend = StubBackend(delay=0.05)
+    cache = SearchCache(backend)
+
+    async def run():
+        leader = asyncio.create_task(cache.search("news"))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.search("news"))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == [{"content": "news about news"}]
+    assert backend.queries == ["news"]
+    assert cache.stats()["entries"] == 1
+
+
+def test_a_request_whose_callers_were_cancelled_still_fills_the_cache():
+    backend = StubBackend(delay=0.02)
+    cache = SearchCache(backend)
+
+    async def run():
+        caller = asyncio.create_task(cache.search("news"))
+        await asyncio.sleep(0.005)
+        caller.cancel()
+        await asyncio.sleep(0.05)
+        return await cache.search("news")
+
+    assert asyncio.run(run()) == [{"content": "news about news"}]
+    assert backend.queries == ["news"]
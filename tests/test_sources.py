@@ -0,0 +1,217 @@
+import asyncio
+import datetime
+import threading
+
+import pandas as pd
+import pytest
+
+from tools.mocked_data import TRADE_COLUMNS, generate_trades, last_business_days
+from tools.sources import (CachingTradesSource, MockTradesSource, ParquetTradesSource, SqliteTradesSource,
+                           TradesDataSource, create_trades_source)
+from util.pool import ConnectionPool
+
+REPORT_DATE = datetime.date(2025, 5, 30)
+DAYS = last_business_days(REPORT_DATE, 12)
+
+
+@pytest.fixture
+def reference():
+    """Seeded trades of two ports over a year, three per month-end."""
+    return generate_trades(["SEL", "AGG"], DAYS, rows_per_day=3, seed=7)
+
+
+def expected(reference, port, report_date, time_period):
+    days = last_business_days(report_date, time_period)
+    trades = reference[(reference['Ticker'] == port) & reference['Trade Date'].isin(days)]
+    return trades.sort_values('Trade Date', ascending=False, kind="stable").reset_index(drop=True)
+
+
+@pytest.fixture(params=["sqlite", "parquet"])
+def source(request, reference, tmp_path):
+    if request.param == "sqlite":
+        source = SqliteTradesSource(str(tmp_path / "trades.sqlite"), pool_size=2)
+        source.write(reference)
+    else:
+        path = tmp_path / "trades.parquet"
+        reference.to_parquet(path)
+        source = ParquetTradesSource(str(path))
+    yield source
+    source.close()
+
+
+def test_fetch(source, reference):
+    trades = asyncio.run(source.fetch("SEL", REPORT_DATE, 3))
+    assert list(trades.columns) == TRADE_COLUMNS
+    assert len(trades) == 9
+    pd.testing.assert_frame_equal(trades, expected(reference, "SEL", REPORT_DATE, 3), check_dtype=False)
+
+
+def test_fetch_many(source, reference):
+    report_dates = [REPORT_DATE, datetime.date(2025, 3, 31)]
+    trades = asyncio.run(source.fetch_many(["SEL", "AGG", "NONE"], report_dates, 2))
+    assert list(trades.columns) == ['Report Date'] + TRADE_COLUMNS
+    for port in ("SEL", "AGG"):
+        for report_date in report_dates:
+            pair = trades[(trades['Ticker'] == port) & (trades['Report Date'] == report_date)]
+            pd.testing.assert_frame_equal(pair.drop(columns="Report Date").reset_index(drop=True),
+                                          expected(reference, port, report_date, 2), check_dtype=False)
+    assert not (trades['Ticker'] == "NONE").any()
+
+
+def test_sqlite_fetches_share_the_pool(reference, tmp_path):
+    source = SqliteTradesSource(str(tmp_path / "trades.sqlite"), pool_size=2)
+    source.write(reference)
+    opened = []
+    connect = source._connect
+    source.pool._connect = lambda: opened.append(1) or connect()
+
+    async def fetch_all():
+        return await asyncio.gather(*(source.fetch("SEL", REPORT_DATE, 3) for _ in range(8)))
+
+    assert all(len(trades) == 9 for trades in asyncio.run(fetch_all()))
+    assert len(opened) <= 2
+    source.close()
+
+
+def test_connection_pool_limits_open_connections():
+    opened, in_use, peak = [], [0], [0]
+    lock = threading.Lock()
+    pool = ConnectionPool(lambda: opened.append(object()) or opened[-1], size=2)
+
+    def worker():
+        with pool.connection():
+            with lock:
+                in_use[0] += 1
+                peak[0] = max(peak[0], in_use[0])
+            threading.Event().wait(0.01)
+            with lock:
+                in_use[0] -= 1
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] <= 2
+    assert len(opened) <= 2
+
+
+def test_create_trades_source(monkeypatch, tmp_path):
+    monkeypatch.setenv("TRADES_DB", str(tmp_path / "trades.sqlite"))
+    monkeypatch.setenv("TRADES_CACHE_MONTHS", "0")
+    source = create_trades_source("sqlite")
+    assert isinstance(source, SqliteTradesSource)
+    source.close()
+
+    monkeypatch.setenv("TRADES_CACHE_MONTHS", "100")
+    source = create_trades_source("mock")
+    assert isinstance(source, CachingTradesSource) and isinstance(source.source, MockTradesSource)
+    assert source.max_months == 100
+
+    with pytest.raises(ValueError):
+        create_trades_source("csv")
+
+
+def test_adapters_only_need_fetch_months(reference):
+    class FrameSource(TradesDataSource):
+        async def fetch_months(self, ports, days):
+            return reference[reference['Ticker'].isin(ports) & reference['Trade Date'].isin(days)]
+
+    trades = asyncio.run(FrameSource().fetch("AGG", REPORT_DATE, 4))
+    pd.testing.assert_frame_equal(trades, expected(reference, "AGG", REPORT_DATE, 4))
+
+
+class CountingSource(TradesDataSource):
+    """Serves the reference trades and records what the cache asks for."""
+
+    def __init__(self, reference):
+        self.reference = reference
+        self.requests = []
+
+    async def fetch_months(self, ports, days):
+        self.requests.append((list(ports), list(days)))
+        trades = self.reference
+        return trades[trades['Ticker'].isin(ports) & trades['Trade Date'].isin(days)].reset_index(drop=True)
+
+
+def test_month_cache_fetches_only_missing_months(reference):
+    inner = CountingSource(reference)
+    cached = CachingTradesSource(inner)
+
+    first = asyncio.run(cached.fetch("SEL", REPORT_DATE, 10))
+    following = asyncio.run(cached.fetch("SEL", datetime.date(2025, 6, 30), 10))
+
+    assert inner.requests[1] == (["SEL"], [datetime.date(2025, 6, 30)])
+    assert cached.stats() == {"months_cached": 9, "months_fetched": 11, "months": 11}
+    pd.testing.assert_frame_equal(first, expected(reference, "SEL", REPORT_DATE, 10))
+    assert len(following) == 27  # June has no reference trades
+
+
+def test_month_cache_warm_results_equal_cold_ones(reference):
+    cached = CachingTradesSource(CountingSource(reference))
+    report_dates = [REPORT_DATE, datetime.date(2025, 2, 28)]
+
+    cold = asyncio.run(cached.fetch_many(["SEL", "AGG"], report_dates, 3))
+    warm = asyncio.run(cached.fetch_many(["SEL", "AGG"], report_dates, 3))
+    uncached = asyncio.run(CountingSource(reference).fetch_many(["SEL", "AGG"], report_dates, 3))
+
+    pd.testing.assert_frame_equal(cold, warm)
+    pd.testing.assert_frame_equal(cold, uncached)
+    assert cached.stats()["months_fetched"] == 12
+
+
+def test_month_cache_is_bounded(reference):
+    inner = CountingSource(reference)
+    cached = CachingTradesSource(inner, max_months=4)
+    asyncio.run(cached.fetch("SEL", REPORT_DATE, 6))
+    assert cached.stats()["months"] == 4
+
+    asyncio.run(cached.fetch("SEL", REPORT_DATE, 2))
+    assert len(inner.requests) == 1  # the newest months are still cached
+
+
+def test_seeded_mock_trades_do_not_depend_on_how_they_are_fetched():
+    from tools.mocked_data import get_trades_data
+
+    source = MockTradesSource(rows_per_day=2, seed=3)
+    single = get_trades_data("SEL", REPORT_DATE, 4, rows_per_day=2, seed=3)
+    report_dates = [REPORT_DATE, datetime.date(2025, 3, 31)]
+
+    batch = asyncio.run(source.fetch_many(["AGG", "SEL"], report_dates, 4))
+    pair = batch[(batch['Ticker'] == "SEL") & (batch['Report Date'] == REPORT_DATE)]
+    pd.testing.assert_frame_equal(pair.drop(columns="Report Date").reset_index(drop=True), single)
+    pd.testing.assert_frame_equal(asyncio.run(source.fetch("SEL", REPORT_DATE, 4)), single)
+
+    cached = CachingTradesSource(source)
+    asyncio.run(cached.fetch("SEL", datetime.date(2025, 3, 31), 4))  # warms two of the four months
+    pd.testing.assert_frame_equal(asyncio.run(cached.fetch("SEL", REPORT_DATE, 4)), single)
+    pd.testing.assert_frame_equal(asyncio.run(cached.fetch_many(["AGG", "SEL"], report_dates, 4)), batch)
+
+
+def test_seeded_blocks_are_drawn_independently_and_at_once():
+    import time
+
+    both = generate_trades(["SEL", "AGG"], DAYS, rows_per_day=3, seed=5, extra_columns=True)
+    one = generate_trades(["AGG"], DAYS[4:6], rows_per_day=2, seed=5, extra_columns=True)
+    block = both[(both['Ticker'] == "AGG") & both['Trade Date'].isin(DAYS[4:6])].groupby('Trade Date', sort=False).head(2)
+    pd.testing.assert_frame_equal(block.reset_index(drop=True), one)
+
+    days = last_business_days(REPORT_DATE, 120)
+    start = time.perf_counter()
+    trades = generate_trades([f"P{i}" for i in range(1000)], days, seed=5)
+    assert time.perf_counter() - start < 3  # one block at a time took about 15 s
+    assert trades['CUSIP'].nunique() > 0.99 * len(trades)
+
+
+def test_extra_columns_are_kept(tmp_path):
+    from tools.mocked_data import EXTRA_COLUMNS
+
+    cached = CachingTradesSource(MockTradesSource(seed=1, extra_columns=True))
+    trades = asyncio.run(cached.fetch("SEL", REPORT_DATE, 2))
+    assert list(trades.columns) == TRADE_COLUMNS + EXTRA_COLUMNS
+
+    path = tmp_path / "trades.parquet"
+    generate_trades(["SEL"], DAYS, seed=1, extra_columns=True).assign(Other=0).to_parquet(path)
+    trades = asyncio.run(ParquetTradesSource(str(path)).fetch_many(["SEL"], [REPORT_DATE], 2))
+    assert list(trades.columns) == ['Report Date'] + TRADE_COLUMNS + EXTRA_COLUMNS
+    assert len(trades) == 2
@@ -0,0 +1,210 @@
+import fnmatch
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from util import state_manager
+from util.state_backends import MemoryBackend, RedisBackend, SqliteBackend, create_state_backend
+
+
+class LocalRedis:
+    """In-process stand-in for the redis-py client methods RedisBackend uses."""
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, nx=False):
+        with self.lock:
+            if nx and key in self.data:
+                return None
+            self.data[key] = value
+            return True
+
+    def getdel(self, key):
+        with self.lock:
+            return self.data.pop(key, None)
+
+    def delete(self, *keys):
+        with self.lock:
+            return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def scan_iter(self, match="*"):
+        return [key.encode() for key in list(self.data) if fnmatch.fnmatch(key, match)]
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        backend = MemoryBackend()
+    elif request.param == "sqlite":
+        backend = SqliteBackend(str(tmp_path / "state.sqlite"))
+    else:
+        backend = RedisBackend(LocalRedis())
+    yield backend
+    backend.close()
+
+
+def test_dict_api(backend):
+    backend.set("a", 1)
+    backend.update({"b": 2, "c": 3})
+
+    assert backend.get("a") == 1
+    assert backend.get("missing", "default") == "default"
+    assert backend.setdefault("a", 10) == 1
+    assert backend.setdefault("d", 4) == 4
+    assert backend.contains("b") and not backend.contains("missing")
+    assert sorted(backend.keys()) == ["a", "b", "c", "d"]
+    assert dict(backend.items()) == {"a": 1, "b": 2, "c": 3, "d": 4}
+    assert backend.pop("b") == 2
+    assert backend.pop("b", "gone") == "gone"
+
+    backend.clear()
+
+    assert backend.keys() == []
+
+
+def test_atomic_operations(backend):
+    calls = []
+
+    def build():
+        calls.append(1)
+        return "built"
+
+    assert backend.get_or_compute("key", build) == "built"
+    assert backend.get_or_compute("key", build) == "built"
+    assert len(calls) == 1
+    assert not backend.compare_and_set("key", "other", "new")
+
+
+def test_sqlite_workers_share_data(tmp_path):
+    path = str(tmp_path / "state.sqlite")
+    first, second = SqliteBackend(path), SqliteBackend(path)
+    df = pd.DataFrame({"Net Money": [1, 2, 3]})
+
+    first.set("dataset:SEL:2025-05-30", df)
+
+    pd.testing.assert_frame_equal(second.get("dataset:SEL:2025-05-30"), df)
+
+
+def test_redis_workers_share_data_under_their_prefix():
+    server = LocalRedis()
+    first, second = RedisBackend(server, prefix="app:"), RedisBackend(server, prefix="app:")
+    other_app = RedisBackend(server, prefix="other:")
+
+    first.set("key", {"port": "SEL"})
+    other_app.set("key", "other")
+
+    assert second.get("key") == {"port": "SEL"}
+    assert second.keys() == ["key"]
+    second.clear()
+    assert other_app.get("key") == "other"
+
+
+def test_create_state_backend_reads_the_environment(monkeypatch, tmp_path):
+    monkeypatch.setenv("STATE_BACKEND", "sqlite")
+    monkeypatch.setenv("STATE_DB", str(tmp_path / "state.sqlite"))
+    assert isinstance(create_state_backend(), SqliteBackend)
+
+    monkeypatch.setenv("STATE_BACKEND", "memory")
+    monkeypatch.setenv("STATE_MAX_ENTRIES", "10")
+    assert create_state_backend().max_entries == 10
+
+    with pytest.raises(ValueError):
+        create_state_backend("memcached")
+
+
+def test_state_manager_uses_a_shared_backend():
+    previous = state_manager.backend
+    server = LocalRedis()
+    try:
+        state_manager.use_backend(RedisBackend(server))
+        state_manager.set("dataset:SEL:2025-05-30", [1, 2, 3])
+
+        # another worker's backend on the same store sees the value
+        assert RedisBackend(server).get("dataset:SEL:2025-05-30") == [1, 2, 3]
+        assert state_manager.pop("dataset:SEL:2025-05-30") == [1, 2, 3]
+        assert "dataset:SEL:2025-05-30" not in state_manager
+    finally:
+        state_manager.use_backend(previous)
+
+
+def test_memory_backend_keeps_max_entries_across_stripes():
+    from tools.datasets import DatasetKey
+
+    backend = MemoryBackend(max_entries=16)
+    keys = [DatasetKey.of(f"PORT{i}", "2025-05-30") for i in range(10)]
+    for key in keys:
+        backend.set(key, pd.DataFrame({"a": [1]}))
+    assert all(backend.contains(key) for key in keys)
+
+    for i in range(6):
+        backend.set(i, i)
+    assert backend.stats()["entries"] == 16
+    assert backend.stats()["evictions"] == 0
+
+    backend.get(keys[0])
+    backend.set("one more", 1)
+    assert backend.stats()["entries"] == 16
+    assert not backend.contains(keys[1])  # the least recently used of all stripes
+    assert backend.contains(keys[0])
+
+
+def test_memory_backend_keeps_max_bytes_across_stripes():
+    from util.state_backends import sizeof
+
+    frame = pd.DataFrame({"a": range(1000)})
+    evicted = []
+    backend = MemoryBackend(max_bytes=10 * sizeof(frame), on_evict=lambda key, value, reason: evicted.append((key, reason)))
+    for i in range(10):
+        backend.set(i, frame.copy())
+    assert sorted(backend.keys()) == list(range(10))
+
+    backend.set(10, frame.copy())
+    assert evicted == [(0, "bytes")]
+    assert backend.stats()["bytes"] == 10 * sizeof(frame)
+
+
+def test_memory_backend_never_evicts_the_new_entry():
+    backend = MemoryBackend(max_bytes=1)
+    backend.set("a", "too large on its own")
+    backend.set("b", "too large on its own")
+    assert backend.keys() == ["b"]
+
+
+def test_memory_backend_ttl():
+    backend = MemoryBackend(ttl=0.05)
+    backend.set("a", 1)
+    time.sleep(0.1)
+    assert backend.get("a") is None
+    assert backend.stats()["expirations"] == 1
+    assert backend.stats()["entries"] == 0
+
+
+def test_memory_backend_get_or_compute_builds_once():
+    backend = MemoryBackend(max_entries=100)
+    calls = []
+    start = threading.Barrier(8)
+
+    def build():
+        calls.append(1)
+        return "value"
+
+    def worker():
+        start.wait()
+        assert backend.get_or_compute("key", build) == "value"
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
@@ -0,0 +1,192 @@
+import pickle
+import threading
+
+import pandas as pd
+import pytest
+
+from util.state_manager import StateManager
+
+
+@pytest.fixture
+def new_manager(monkeypatch, tmp_path):
+    """Build fresh StateManager instances persisting to tmp_path, the app's singleton is restored afterwards."""
+    monkeypatch.setattr(StateManager, "_persist_dir", str(tmp_path / "state"))
+
+    def build():
+        monkeypatch.setattr(StateManager, "_instance", None)
+        return StateManager()
+
+    return build
+
+
+def test_saved_keys_are_read_back_lazily_after_a_restart(new_manager):
+    manager = new_manager()
+    df = pd.DataFrame({"Net Money": [1, 2, 3]})
+    manager.set("dataset:SEL:2025-05-30", df)
+    manager.set("settings", {"theme": "dark"})
+    manager.set("removed", 1)
+    manager.persist()
+    manager.pop("removed")
+    manager.persist()
+
+    restarted = new_manager()
+
+    assert sorted(restarted.keys()) == ["dataset:SEL:2025-05-30", "settings"]
+    assert restarted.backend.keys() == []  # nothing is read before it is used
+    pd.testing.assert_frame_equal(restarted.get("dataset:SEL:2025-05-30"), df)
+    assert restarted["settings"] == {"theme": "dark"}
+    assert "removed" not in restarted
+
+
+def test_persist_file_keyword_still_works(new_manager, tmp_path):
+    legacy = tmp_path / "app_state.pickle"
+    legacy.write_bytes(pickle.dumps({"settings": {"theme": "dark"}}))
+    manager = new_manager()
+
+    with pytest.deprecated_call():
+        manager.enable_persistence(auto_persist=False, persist_file=str(legacy))
+    manager.persist()
+
+    assert manager["settings"] == {"theme": "dark"}
+    assert (tmp_path / "app_state" / "index.log").exists()
+
+
+def test_sets_racing_a_save_are_not_lost(new_manager):
+    manager = new_manager()
+    stop = threading.Event()
+
+    def save():
+        while not stop.is_set():
+            manager.persist()
+
+    saver = threading.Thread(target=save)
+    saver.start()
+    try:
+        for key in range(2000):
+            manager.set(f"key-{key}", key)
+    finally:
+        stop.set()
+        saver.join()
+    manager.persist()
+
+    restarted = new_manager()
+
+    assert len(restarted.keys()) == 2000
+
+
+def test_threads_keep_their_own_values(new_manager):
+    manager = new_manager()
+    with manager.scope("thread-a"):
+        manager.set("dataset", "a")
+    with manager.scope("thread-b"):
+        assert manager.get("dataset") == "a"  # read through to the global tier
+        manager.set("dataset", "b")
+    with manager.scope("thread-a"):
+        assert manager.get("dataset") == "a"
+        assert manager.pop("dataset") == "a"
+        assert manager.get("dataset") == "b"
+    assert manager.get("dataset") == "b"
+
+
+def test_evicted_values_are_not_served_in_a_scope(new_manager):
+    from util.state_backends import MemoryBackend
+
+    manager = new_manager()
+    manager.use_backend(MemoryBackend(max_entries=1))
+    with manager.scope("thread"):
+        for i in range(4):
+            manager.set(f"frame{i}", pd.DataFrame({"a": [i]}))
+        served = [key for key in ("frame0", "frame1", "frame2") if manager.get(key) is not None]
+    assert served == []
+    assert manager.backend.stats()["entries"] == 1
+
+
+def test_drop_namespace_releases_the_thread(new_manager):
+    manager = new_manager()
+    with manager.scope("thread"):
+        manager.set("a", 1)
+        manager.set("b", 2)
+    with manager.scope("other"):
+        manager.set("a", 3)
+
+    assert manager.stats()["namespaces"] == 2
+    assert manager.drop_namespace("thread") == 2
+    assert manager.stats()["namespaces"] == 1
+    with manager.scope("thread"):
+        assert manager.get("a") == 3  # only the global tier is left
+    with manager.scope("other"):
+        assert manager.get("a") == 3
+
+
+def test_least_recently_used_namespaces_are_dropped(new_manager, monkeypatch):
+    monkeypatch.setattr(StateManager, "_max_namespaces", 2)
+    manager = new_manager()
+    for name in ("one", "two", "three"):
+        with manager.scope(name):
+            manager.set("key", name)
+    assert sorted(key for key in manager if key.startswith("thread:")) == ["thread:three:key", "thread:two:key"]
+
+
+def test_writes_do_not_wait_for_the_class_lock(new_manager):
+    manager = new_manager()
+    done = threading.Event()
+
+    def write():
+        manager.set("key", 1)
+        manager.pop("key")
+        manager.update(other=2)
+        done.set()
+
+    with StateManager._lock:
+        threading.Thread(target=write).start()
+        assert done.wait(5)
+    manager.persist()
+    assert new_manager()["other"] == 2
+
+
+def test_dropping_every_namespace_frees_every_value(new_manager):
+    from util.state_backends import MemoryBackend, sizeof
+
+    manager = new_manager()
+    manager.use_backend(MemoryBackend(max_bytes=10**9))
+    frame = pd.DataFrame({"a": range(1000)})
+    for name in ("one", "two", "three"):
+        with manager.scope(name):
+            manager.set(f"dataset:{name}", frame.copy())
+
+    stats = manager.backend.stats()
+    assert stats["bytes"] < 3 * sizeof(frame) + 1000  # one copy per frame, the global keys only hold links
+    with manager.scope("other"):
+        assert manager.get("dataset:one") is not None  # read through the global tier
+
+    for name in ("one", "two", "three", "other"):
+        manager.drop_namespace(name)
+    assert manager.backend.stats()["entries"] == 0
+    assert manager.get("dataset:one") is None
+
+
+def test_drop_namespace_only_touches_its_own_keys(new_manager):
+    manager = new_manager()
+    manager.set("global", 1)
+    with manager.scope("thread"):
+        manager.set("a", 1)
+    backend = manager.backend
+    backend.iter_keys = backend.keys = lambda: pytest.fail("drop_namespace scanned the store")
+
+    assert manager.drop_namespace("thread") == 1
+    assert backend.peek("global") == 1
+
+
+def test_namespaced_values_are_saved_once_and_dropped_after_a_restart(new_manager):
+    manager = new_manager()
+    with manager.scope("thread"):
+        manager.set("dataset", pd.DataFrame({"a": [1]}))
+    manager.persist()
+
+    restarted = new_manager()
+    assert type(restarted._get_store().load("dataset")).__name__ == "_Link"  # not a second copy of the frame
+    with restarted.scope("thread"):
+        assert restarted.get("dataset")["a"].tolist() == [1]
+    assert restarted.get("dataset")["a"].tolist() == [1]  # the global link survives too
+    assert restarted.drop_namespace("thread") == 1
+    assert restarted.get("dataset") is None
@@ -0,0 +1,51 @@
+import asyncio
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langgraph.graph import END, StateGraph
+
+import chatgraph
+from util.llm_cache import ResponseCache
+
+
+def model_graph():
+    builder = StateGraph(chatgraph.State)
+    builder.add_node("model", chatgraph.model)
+    builder.set_entry_point("model")
+    builder.add_edge("model", END)
+    return builder.compile()
+
+
+async def streamed_answer(graph, prompt: str) -> tuple:
+    """The answer the chat renders and the event types it got, filtered like ui.py does."""
+    answer, seen = "", []
+    turn = {"messages": [SystemMessage(content="You are a finance bot."), HumanMessage(content=prompt)]}
+    async for event in graph.astream_events(
+        turn, version="v2", include_types=chatgraph.STREAM_EVENT_TYPES, include_names=chatgraph.STREAM_EVENT_NAMES
+    ):
+        seen.append(event["event"])
+        if event["event"] == "on_chat_model_stream":
+            answer += event["data"]["chunk"].content
+        elif event["event"] == "on_custom_event" and event["name"] == "model_cache_hit":
+            answer += event["data"]["message"].content
+    return answer, seen
+
+
+def test_cached_model_turns_stream_as_one_custom_event(monkeypatch):
+    fake = GenericFakeChatModel(messages=iter([AIMessage(content="SEL-AGG returned 4.2%")]))
+    monkeypatch.setattr(chatgraph, "get_llm_with_tools", lambda: fake)
+    cache = ResponseCache()
+    monkeypatch.setattr(chatgraph, "get_response_cache", lambda: cache)
+    monkeypatch.setattr(chatgraph, "get_llm_cache_salt", lambda: "test")
+    graph = model_graph()
+
+    async def run():
+        first = await streamed_answer(graph, "Show me the performance data of SEL-AGG.")
+        cached = await streamed_answer(graph, "Show me the performance data of SEL-AGG.")
+        return first, cached
+
+    (first_answer, first_events), (cached_answer, cached_events) = asyncio.run(run())
+
+    assert first_answer == cached_answer == "SEL-AGG returned 4.2%"
+    assert "on_chat_model_stream" in first_events
+    assert cached_events == ["on_custom_event"]
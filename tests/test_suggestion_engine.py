@@ -0,0 +1,101 @@
+import asyncio
+import json
+import os
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from tools import suggestions
+from tools.suggestion_engine import QUESTION_BANK, SuggestionEngine, tokenize
+
+ESG_QUERY = "Which ESG scores do the holdings have?"
+ESG_FOLLOWUPS = ["How do ESG scores compare to the benchmark?", "Which holdings have the lowest ESG score?",
+                 "How did the ESG score change this year?"]
+
+
+def test_tokenize_drops_stopwords_and_splits_ports():
+    assert tokenize("What's the YTD return of SEL-AGG?") == ["ytd", "return", "sel", "agg"]
+
+
+def test_known_intents_are_answered_offline():
+    engine = SuggestionEngine()
+
+    followups = engine.suggest("Show me the risk of the fund")
+
+    assert len(followups) == 3
+    assert set(followups) <= set(QUESTION_BANK["risk"]["followups"])
+
+
+def test_unknown_queries_fall_back():
+    engine = SuggestionEngine()
+
+    assert engine.suggest("What is the weather in Paris?") is None
+    assert engine.suggest(ESG_QUERY) is None  # a weak match stays below the threshold
+
+
+def test_learned_queries_are_answered_offline():
+    engine = SuggestionEngine()
+    engine.learn(ESG_QUERY, ESG_FOLLOWUPS)
+
+    assert engine.suggest("which esg scores do holdings have") == ESG_FOLLOWUPS
+
+
+def test_clicks_raise_a_followup_for_similar_queries():
+    engine = SuggestionEngine()
+    clicked = QUESTION_BANK["risk"]["followups"][-1]
+    assert engine.rank("Show me the risk of the fund")[0][0] != clicked
+
+    engine.record_click("Show me the risk of the fund", clicked)
+
+    assert engine.rank("show me the risk of this fund")[0][0] == clicked
+
+
+def test_learned_queries_survive_a_restart(tmp_path):
+    path = str(tmp_path / "bank.json")
+    SuggestionEngine(path=path).learn(ESG_QUERY, ESG_FOLLOWUPS)
+
+    with open(path) as f:
+        saved = json.load(f)
+
+    assert [document["query"] for document in saved] == [ESG_QUERY]  # the curated bank is not saved
+    assert SuggestionEngine(path=path).suggest(ESG_QUERY) == ESG_FOLLOWUPS
+    assert os.listdir(tmp_path) == ["bank.json"]  # no temporary file left behind
+
+
+def test_clicks_on_curated_queries_survive_a_restart(tmp_path):
+    path = str(tmp_path / "bank.json")
+    query = QUESTION_BANK["risk"]["queries"][0]
+    clicked = QUESTION_BANK["risk"]["followups"][-1]
+    engine = SuggestionEngine(path=path)
+    assert engine.rank(query)[0][0] != clicked
+    for _ in range(5):
+        engine.record_click(query, clicked)
+
+    with open(path) as f:
+        assert json.load(f) == [{"query": query, "followups": {clicked: 10.0}}]  # only the clicks, not the bank
+    restarted = SuggestionEngine(path=path)
+    assert restarted.rank(query)[0][0] == clicked
+
+    restarted.save()
+    with open(path) as f:
+        assert json.load(f) == [{"query": query, "followups": {clicked: 10.0}}]  # weights are not doubled on reload
+
+
+def test_async_learn_saves_the_bank(tmp_path):
+    path = str(tmp_path / "bank.json")
+    engine = SuggestionEngine(path=path)
+
+    asyncio.run(engine.alearn(ESG_QUERY, ESG_FOLLOWUPS))
+
+    assert SuggestionEngine(path=path).suggest(ESG_QUERY) == ESG_FOLLOWUPS
+
+
+def test_llm_answers_are_learned(monkeypatch):
+    engine = SuggestionEngine()
+    llm = FakeListChatModel(responses=["\n".join(f"- {question}" for question in ESG_FOLLOWUPS)])
+    monkeypatch.setattr(suggestions, "get_suggestion_engine", lambda: engine)
+    monkeypatch.setattr(suggestions, "get_suggestion_llm", lambda: llm)
+
+    assert asyncio.run(suggestions.asuggest_followups(ESG_QUERY + " ")) == ESG_FOLLOWUPS
+    # a similar query is now answered by the engine, the fake LLM has no responses left
+    llm.responses = []
+    assert asyncio.run(suggestions.asuggest_followups("Which ESG scores do our holdings have")) == ESG_FOLLOWUPS
@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+from tools.mocked_data import TRADE_COLUMNS, get_trades_data
+from tools.transform import TransformPlan, fast_transform, parse_prompt
+
+
+@pytest.fixture(scope="module")
+def trades():
+    return get_trades_data("SEL", "2025-05-30", 10, rows_per_day=20, seed=1)
+
+
+@pytest.mark.parametrize("prompt, plan", [
+    ("sum net money by month", TransformPlan(op="aggregate", column="Net Money", groups=["month"])),
+    ("Top 5 trades by net money", TransformPlan(op="top", column="Net Money", n=5, ascending=False)),
+    ("how many trades are there?", TransformPlan(op="count", agg="count")),
+    ("trades where net money > 50m", TransformPlan(op="filter", filters=[("Net Money", "gt", 50_000_000)])),
+    ("average net money where net money above 1m and ticker is SEL", TransformPlan(
+        op="aggregate", agg="mean", column="Net Money",
+        filters=[("Net Money", "gt", 1_000_000), ("Ticker", "eq", "sel")])),
+    ("count trades where quarter is 2025Q1", TransformPlan(
+        op="count", agg="count", filters=[("quarter", "eq", "2025q1")])),
+])
+def test_parse_prompt(prompt, plan):
+    assert parse_prompt(prompt, TRADE_COLUMNS) == plan
+
+
+@pytest.mark.parametrize("prompt", [
+    "trades where cusip is A1B2 or net money over 5m",  # the value swallowed a second condition
+    "trades where ticker is SEL, net money over 5m",
+    "trades where sec desc contains fund where net money > 1m",
+    "trades where month is may",  # derived parts are "2025-05" period strings
+    "trades where quarter is q2",
+    "which securities drove the change in net money?",
+])
+def test_parse_prompt_falls_back(prompt):
+    assert parse_prompt(prompt, TRADE_COLUMNS) is None
+
+
+def test_fast_transform(trades):
+    assert fast_transform(trades, "how many trades are there") == 200
+    assert fast_transform(trades, "total net money") == trades["Net Money"].sum()
+    assert len(fast_transform(trades, "trades where month is 2025-05")) == 20
+    assert fast_transform(trades, "count trades where quarter is 2025Q1") == 60
+
+    by_month = fast_transform(trades, "sum net money by month")
+    assert list(by_month.columns) == ["month", "Net Money"] and len(by_month) == 10
+
+
+def test_fast_transform_falls_back_when_a_text_filter_matches_nothing(trades):
+    assert fast_transform(trades, "trades where ticker is XYZ") is None
+    assert fast_transform(trades, "total net money where ticker is sel") == trades["Net Money"].sum()
+    assert isinstance(fast_transform(trades, "trades where ticker is not SEL"), pd.DataFrame)
@@ -8,6 +8,7 @@ from langchain_core.callbacks import (
 from langchain_core.tools import BaseTool
 from langchain_core.tools.base import ArgsSchema
 from pydantic import BaseModel, Field
+from .datasets import DatasetKey
 
 
 class ChartInput(BaseModel):
@@ -25,11 +26,7 @@ class ChartTool(BaseTool):
         self, port: str, report_date: datetime.date, chart_type: datetime.date, run_manager: Optional[CallbackManagerForToolRun] = None
     ) -> pd.DataFrame:
         """Use the tool."""
-        data_id = repr({
-            'port': port,
-            'report_date': str(report_date)
-        })
-        return f"{data_id}||{chart_type}"
+        return f"{DatasetKey.of(port, report_date)}||{chart_type}"
 
     async def _arun(
         self, port: str, report_date: datetime.date, chart_type: datetime.date,
@@ -38,12 +35,14 @@ class ChartTool(BaseTool):
         """Use the tool asynchronously."""
         return self._run(port, report_date, chart_type, run_manager=run_manager.get_sync())
     
-import streamlit as st
-import matplotlib.pyplot as plt
-import seaborn as sns
 import pandas as pd
 
 def generate_chart(df, chart_type):
+    # plotting libraries are imported on the first chart, not when the tool module loads
+    import streamlit as st
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     # Expanded mock data
     data = {
         'Category': df['Trade Date'],
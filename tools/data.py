@@ -1,4 +1,5 @@
-from typing import Optional
+import asyncio
+from typing import Dict, List, Optional, Tuple
 import pandas as pd
 import datetime
 from langchain_core.callbacks import (
@@ -8,10 +9,11 @@ from langchain_core.callbacks import (
 from langchain_core.tools import BaseTool
 from langchain_core.tools.base import ArgsSchema
 from pydantic import BaseModel, Field
-from langchain_experimental.agents.agent_toolkits import create_pandas_dataframe_agent
-from langchain_openai import ChatOpenAI
-from util import state_manager
-from .mocked_data import get_trades_data
+from util.executor import run_blocking
+from util.startup import singleton
+from .datasets import DatasetKey, load_dataset
+from .sources import get_trades_source
+from .transform import fast_transform, format_result
 
 class DataInput(BaseModel):
     port: str = Field(description="port")
@@ -27,7 +29,7 @@ class DataFetchTool(BaseTool):
         self, port: str, report_date: datetime.date, run_manager: Optional[CallbackManagerForToolRun] = None
     ) -> pd.DataFrame:
         """Use the tool."""
-        df = get_trades_data(port, report_date, 10)
+        df = asyncio.run(get_trades_source().fetch(port, report_date, 10))
         return df
 
     async def _arun(
@@ -36,9 +38,80 @@ class DataFetchTool(BaseTool):
         run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
     ) -> int:
         """Use the tool asynchronously."""
-        return self._run(port, report_date, run_manager=run_manager.get_sync())
+        return await get_trades_source().fetch(port, report_date, 10)
     
 
+class BatchDataInput(BaseModel):
+    ports: List[str] = Field(description="ports")
+    report_dates: List[datetime.date] = Field(description="report_dates")
+
+class BatchDataFetchTool(BaseTool):
+    name: str = "batch_data_fetch_tool"
+    description: str = "use instead of several data_fetch_tool calls when you need dataframes/data for more than one portfolio or report date, e.g. to compare funds or periods, every port is fetched for every report date in one call"
+    args_schema: Optional[ArgsSchema] = BatchDataInput
+    return_direct: bool = True
+
+    def _run(
+        self, ports: List[str], report_dates: List[datetime.date], run_manager: Optional[CallbackManagerForToolRun] = None
+    ) -> pd.DataFrame:
+        """Use the tool."""
+        return asyncio.run(self._arun(ports, report_dates))
+
+    async def _arun(
+        self,
+        ports: List[str], report_dates: List[datetime.date],
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> pd.DataFrame:
+        """Use the tool asynchronously."""
+        # one bulk query for every pair instead of one fetch per port and date
+        return await get_trades_source().fetch_many(list(dict.fromkeys(ports)), list(dict.fromkeys(report_dates)), 10)
+
+
+def split_batch(trade_data: pd.DataFrame, ports: List[str] = (), report_dates: List[datetime.date] = ()
+                ) -> Dict[Tuple[str, datetime.date], pd.DataFrame]:
+    """
+    Per (port, report_date) frames of a batch fetch, with the single fetch columns.
+
+    Every requested pair of ``ports`` and ``report_dates`` gets a frame, an
+    empty one when the source has no trades for it, so later tools find it
+    cached instead of getting None.
+    """
+    frames = {
+        (port, report_date): frame.drop(columns="Report Date").reset_index(drop=True)
+        for (port, report_date), frame in trade_data.groupby(["Ticker", "Report Date"], sort=False)
+    }
+    found = {DatasetKey.of(port, report_date) for port, report_date in frames}
+    empty = trade_data.drop(columns="Report Date").iloc[0:0].reset_index(drop=True)
+    for port in ports:
+        for report_date in report_dates:
+            if DatasetKey.of(port, report_date) not in found:
+                frames[(port, report_date)] = empty.copy()
+    return frames
+    
+
+@singleton("pandas agent llm")
+def get_agent_llm():
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(temperature=0, model="gpt-4.1")
+
+
+def create_agent(df: pd.DataFrame):
+    """Build the pandas agent, langchain_experimental is only imported when a transformation runs."""
+    from langchain_experimental.agents.agent_toolkits import create_pandas_dataframe_agent
+
+    return create_pandas_dataframe_agent(
+        get_agent_llm(),
+        df, verbose=False,
+        allow_dangerous_code=True
+    )
+
+
+def transform_fast(df: pd.DataFrame, transformation_prompt: str) -> Optional[str]:
+    """Answer of the deterministic pandas fast path, None when the prompt needs the agent."""
+    result = None if df is None else fast_transform(df, transformation_prompt)
+    return None if result is None else format_result(result)
+
 class DataTransformationInput(BaseModel):
     port: str = Field(description="port")
     report_date: datetime.date = Field(description="report date")
@@ -53,18 +126,12 @@ class DataTransformationTool(BaseTool):
     def _run(
         self, port: str, report_date: datetime.date, transformation_prompt: str, run_manager: Optional[CallbackManagerForToolRun] = None
     ) -> pd.DataFrame:
-        print('function begins')
         """Use the tool."""
-        data_id = repr({
-            'port': port,
-            'report_date': str(report_date)
-        })
-        df = state_manager.get(data_id)
-        agent = create_pandas_dataframe_agent(
-            ChatOpenAI(temperature=0, model="gpt-4.1"),
-            df, verbose=True, 
-            allow_dangerous_code=True
-        )
+        df = load_dataset(port, report_date)
+        response = transform_fast(df, transformation_prompt)
+        if response is not None:
+            return response
+        agent = create_agent(df)
         response = agent.run(transformation_prompt)
 
         return response
@@ -74,5 +141,14 @@ class DataTransformationTool(BaseTool):
         run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
     ) -> int:
         """Use the tool asynchronously."""
-        return self._run(port, report_date, transformation_prompt, run_manager=run_manager.get_sync())
+        df = await run_blocking(load_dataset, port, report_date)
+        # filters, group-bys, sorts and the like run as plain pandas, without any LLM call
+        response = await run_blocking(transform_fast, df, transformation_prompt)
+        if response is not None:
+            return response
+        agent = create_agent(df)
+        # LLM calls are awaited natively, the agent runs generated pandas code off the event loop
+        response = await agent.ainvoke({"input": transformation_prompt})
+
+        return response["output"]
         
\ No newline at end of file
@@ -0,0 +1,102 @@
+import datetime
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Set, Union
+
+import pandas as pd
+from util import state_manager
+
+DateLike = Union[str, datetime.date, datetime.datetime, pd.Timestamp]
+
+_ALIASES_PER_KEY = 32 # raw spellings remembered per dataset for the mismatch counter
+_ALIASED_KEYS = 1024 # datasets with remembered spellings, least recently stored are forgotten first
+
+_counters = {"hits": 0, "misses": 0, "mismatch_hits": 0}
+_aliases: "OrderedDict[DatasetKey, Set[str]]" = OrderedDict()
+_stats_lock = threading.Lock()
+
+
+def normalize_port(port: str) -> str:
+    """'sel agg', ' SEL_AGG ' and 'SEL-AGG' all name the same portfolio."""
+    return re.sub(r"[\s_]+", "-", str(port).strip()).upper()
+
+
+def normalize_date(report_date: DateLike) -> datetime.date:
+    if isinstance(report_date, datetime.datetime):
+        return report_date.date()
+    if isinstance(report_date, datetime.date):
+        return report_date
+    try:
+        return datetime.date.fromisoformat(str(report_date).strip())
+    except ValueError:
+        return pd.Timestamp(str(report_date).strip()).date()
+
+
+@dataclass(frozen=True)
+class DatasetKey:
+    """Canonical, hashable cache key of a portfolio dataset."""
+
+    port: str
+    report_date: datetime.date
+
+    @classmethod
+    def of(cls, port: str, report_date: DateLike) -> "DatasetKey":
+        return cls(normalize_port(port), normalize_date(report_date))
+
+    @classmethod
+    def from_args(cls, args: dict) -> "DatasetKey":
+        """Key of a tool call's arguments, other arguments (chart type, prompt...) are ignored."""
+        return cls.of(args["port"], args["report_date"])
+
+    def __str__(self):
+        # shared state backends store keys as strings
+        return f"dataset:{self.port}:{self.report_date.isoformat()}"
+
+
+def _raw_key(port, report_date) -> str:
+    # the key the tools used to build by hand, kept to measure what normalization saves
+    return repr({'port': port, 'report_date': str(report_date)})
+
+
+def store_dataset(port: str, report_date: DateLike, df: pd.DataFrame) -> DatasetKey:
+    """Cache a fetched dataset, in the current chat thread's namespace when one is active."""
+    key = DatasetKey.of(port, report_date)
+    state_manager.set(key, df)
+    with _stats_lock:
+        aliases = _aliases.setdefault(key, set())
+        _aliases.move_to_end(key)
+        if len(aliases) < _ALIASES_PER_KEY:
+            aliases.add(_raw_key(port, report_date))
+        while len(_aliases) > _ALIASED_KEYS:
+            _aliases.popitem(last=False)
+    return key
+
+
+def load_dataset(port: str, report_date: DateLike) -> Optional[pd.DataFrame]:
+    """Cached dataset for a portfolio and date, None if it has not been fetched."""
+    key = DatasetKey.of(port, report_date)
+    df = state_manager.get(key)
+    with _stats_lock:
+        if df is None:
+            _counters["misses"] += 1
+        else:
+            _counters["hits"] += 1
+            if _raw_key(port, report_date) not in _aliases.get(key, ()):
+                _counters["mismatch_hits"] += 1
+    return df
+
+
+def dataset_stats() -> dict:
+    """
+    Lookup counters. ``mismatch_hits`` are hits the raw ``repr(args)`` keys
+    would have missed (different port casing, date format...).
+    """
+    with _stats_lock:
+        lookups = _counters["hits"] + _counters["misses"]
+        return {
+            **_counters,
+            "hit_rate": _counters["hits"] / lookups if lookups else 0.0,
+            "raw_key_hit_rate": (_counters["hits"] - _counters["mismatch_hits"]) / lookups if lookups else 0.0,
+        }
@@ -1,122 +1,178 @@
 import pandas as pd
 from pandas.tseries.offsets import BMonthEnd
+import numpy as np
 import datetime
-import random
+import os
 import string
+import zlib
+from typing import List, Optional
 
+## Defaults for the app, the functions below take them as arguments too
+MOCK_ROWS_PER_DAY = int(os.getenv("MOCK_ROWS_PER_DAY", "1")) # trades generated per port and month-end
+MOCK_SEED = int(os.getenv("MOCK_SEED")) if os.getenv("MOCK_SEED") else None # same seed, port and day, same trades
+MOCK_EXTRA_COLUMNS = os.getenv("MOCK_EXTRA_COLUMNS", "false").lower() == "true" # add Tran Type, Td Num, Quantity, Trade Type
 
+TRADE_COLUMNS = ['Trade Date', 'CUSIP', 'ISIN', 'Bloomberg', 'Net Money', 'Ticker', 'Sec Desc']
+EXTRA_COLUMNS = ['Tran Type', 'Td Num', 'Quantity', 'Trade Type']
 
-## This function generates Random String of four words
-def generate_random_four_word_string():
-    word_list = [
-        "Short", "Master", "Class", "valuable", "Equity", "Ideal", "Fund", "hedge", "growth"
-    ]
-    return ' '.join(random.sample(word_list, 2))
+_ALPHANUMERIC = np.array(list(string.ascii_uppercase + string.digits))
+_WORDS = ["Short", "Master", "Class", "valuable", "Equity", "Ideal", "Fund", "hedge", "growth"]
+## every ordered pair of two different words, like random.sample(_WORDS, 2)
+_WORD_PAIRS = np.array([f"{first} {second}" for first in _WORDS for second in _WORDS if first != second])
 
 
-## This function is to generate random integer between 7 to 9 digits
-def generate_random_integer():
-    # Choose a random length between 7 and 9
-    length = random.randint(7, 9)
-    # Generate a number with the chosen length
-    lower_bound = 10**(length - 1)
-    upper_bound = 10**length - 1
-    return random.randint(lower_bound, upper_bound)
 
+## splitmix64 finalizer, maps every uint64 to a well mixed one
+def _mix64(x: np.ndarray) -> np.ndarray:
+    with np.errstate(over="ignore"):
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
 
 
-## This also generates integer between 4 to 6 numbers
-def generate_quantity():
-    # Choose a random length between 4 and 6
-    length = random.randint(4, 6)
-    # Generate a number with the chosen length
-    lower_bound = 10**(length - 1)
-    upper_bound = 10**length - 1
-    return random.randint(lower_bound, upper_bound)
-
-
-
-### Gives the list of last business day from the current report date over a time period
-def last_business_days(date, time_period):
-    last_business_days = []
-    date = pd.to_datetime(date)
-    
-    for i in range(time_period):
-        last_business_day = (date - pd.DateOffset(months=i)).to_period('M').to_timestamp() + BMonthEnd()
-        last_business_days.append(last_business_day.date())
-    
-    return last_business_days
-
-
-
-## This generates ALphanumeric number of 8 size
-def generate_random_uppercase_alphanumeric():
-    length = 8
-    characters = string.ascii_uppercase + string.digits
-    return ''.join(random.choices(characters, k=length))
-
-
-
-## THis is for generating the number having fixed prefix
-def generate_alphanumeric_code(prefix):
-    
-    remaining_length = 6  # Total length should be 8, and "BL" takes 2 characters
-    alphanumeric_part = ''.join(random.choices(string.ascii_uppercase + string.digits, k=remaining_length))
-    return prefix + alphanumeric_part
 
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
 
+def _step(x: np.ndarray, counter) -> np.ndarray:
+    with np.errstate(over="ignore"):
+        return _mix64(x + np.asarray(counter, dtype=np.uint64) * _GOLDEN)
 
 
-def get_trades_data(port: str, report_date: datetime.date, time_period: int) -> pd.DataFrame:
 
-    trade_data = pd.DataFrame(columns = ['Trade Date','CUSIP','ISIN','Bloomberg','Net Money'
-                                         ,'Ticker','Sec Desc'])
+def _block_hash(value) -> np.uint64:
+    return np.uint64(zlib.crc32(repr(value).encode()))
 
-    #generating the date list for the trades date column
-    date_list =  last_business_days(report_date, time_period)
-    trade_data['Trade Date'] = date_list
-
-    ## Populating the CUSIP column ##
-
-    trade_data['CUSIP'] = [generate_random_uppercase_alphanumeric() for i in range(trade_data.shape[0])]
-
-
-    ##populating the Bloomberg column
-
-    trade_data['Bloomberg'] = [generate_alphanumeric_code("BL") for i in range(trade_data.shape[0])]
 
-    ## Populating the ISIN column 
-    
-    trade_data['ISIN'] = [generate_alphanumeric_code("ISI") for i in range(trade_data.shape[0])]
 
-    ## populating NET Money column ##
+## Counter based stand-in for the integers() draws of a Generator: the value of a draw is a hash of
+## (seed, port, day, row in the block, draw number), so all blocks are drawn at once and a row never
+## depends on what else is generated with it
+class _CounterRng:
+    def __init__(self, seed: int, ports: List[str], days: List[datetime.date], rows_per_day: int):
+        seed_key = _step(np.uint64(seed & 0xFFFFFFFFFFFFFFFF), 1)
+        port_keys = _step(seed_key, np.array([_block_hash(port) for port in ports], dtype=np.uint64))
+        block_keys = _step(port_keys[:, None], np.array([_block_hash(str(day)) for day in days], dtype=np.uint64))
+        self._row_keys = _step(block_keys[:, :, None], np.arange(rows_per_day, dtype=np.uint64)).ravel()
+        self._draws = 0
 
-    trade_data['Net Money'] = [generate_random_integer() for i in range(trade_data.shape[0])] 
+    ## same arguments as Generator.integers, the first axis is the row, high - low must stay below 2**32
+    def integers(self, low, high=None, size=None, dtype=np.int64) -> np.ndarray:
+        if high is None:
+            low, high = 0, low
+        low, high = np.asarray(low, dtype=np.int64), np.asarray(high, dtype=np.int64)
+        shape = (size,) if isinstance(size, int) else tuple(size or np.broadcast(low, high, self._row_keys).shape)
+        width = int(np.prod(shape[1:], dtype=np.int64))
+        draws = np.arange(self._draws, self._draws + width, dtype=np.uint64)
+        self._draws += width
+        bits = _step(self._row_keys[:, None], draws[None, :]).reshape(shape) >> np.uint64(32)
+        # the top 32 bits scaled to the span, like Lemire's multiply-shift
+        offsets = (bits * (high - low).astype(np.uint64)) >> np.uint64(32)
+        return (low + offsets.astype(np.int64)).astype(dtype)
 
-    ## populating ticker column ##
 
-    trade_data['Ticker'] = [port for i in range(trade_data.shape[0])]
 
-    # ## poupulating the Tran Type Column
+## Alphanumeric codes of a fixed size, optionally behind a fixed prefix
+def random_codes(rng, n: int, length: int, prefix: str = "") -> np.ndarray:
+    chars = _ALPHANUMERIC[rng.integers(0, len(_ALPHANUMERIC), size=(n, length))]
+    if prefix:
+        chars = np.hstack([np.broadcast_to(np.array(list(prefix)), (n, len(prefix))), chars])
+    # rows of single characters viewed as one fixed-width string each
+    return np.ascontiguousarray(chars).view(f"<U{chars.shape[1]}").ravel()
 
-    # trade_data['Tran Type'] = [random.choice(["BUY", "SELL"]) for i in range(trade_data.shape[0])]
 
-    # ## Trade Number column
-    # trade_data['Td Num'] = [random.randint(1000, 9999) for i in range(trade_data.shape[0])]
 
-    # ## Quantity
-    # trade_data['Quantity'] = [generate_quantity() for i in range(trade_data.shape[0])]
+## Integers with a random number of digits between min_digits and max_digits
+def random_integers(rng, n: int, min_digits: int, max_digits: int) -> np.ndarray:
+    digits = rng.integers(min_digits, max_digits + 1, size=n)
+    return rng.integers(10 ** (digits - 1), 10 ** digits, dtype=np.int64)
 
-    # ## Trade type - Long Term/ Short Term
 
-    # trade_data['Trade Type'] = [random.choice(["LONG TERM", "SHORT TERM"]) for i in range(trade_data.shape[0])]
-
-    ## Security Description
-    
-    trade_data['Sec Desc'] = [generate_random_four_word_string() for i in range(trade_data.shape[0])]
-    
-    return trade_data
-
-    
 
+### Gives the list of last business day from the current report date over a time period
+def last_business_days(date, time_period):
+    months = pd.period_range(end=pd.Timestamp(date).to_period('M'), periods=time_period, freq='M')[::-1]
+    return list((months.to_timestamp() + BMonthEnd()).date)
+
+
+
+## Random columns of n trades, the extra columns are drawn last so the others do not depend on them
+def _draw_columns(rng, n: int, extra_columns: bool) -> dict:
+    columns = {
+        'CUSIP': random_codes(rng, n, 8),
+        'ISIN': random_codes(rng, n, 6, prefix="ISI"),
+        'Bloomberg': random_codes(rng, n, 6, prefix="BL"),
+        'Net Money': random_integers(rng, n, 7, 9),
+        'Sec Desc': _WORD_PAIRS[rng.integers(0, len(_WORD_PAIRS), size=n)],
+    }
+    if extra_columns:
+        columns['Tran Type'] = np.array(["BUY", "SELL"])[rng.integers(0, 2, size=n)]
+        columns['Td Num'] = rng.integers(1000, 10000, size=n)
+        columns['Quantity'] = random_integers(rng, n, 4, 6)
+        columns['Trade Type'] = np.array(["LONG TERM", "SHORT TERM"])[rng.integers(0, 2, size=n)]
+    return columns
+
+
+
+def generate_trades(ports: List[str], days: List[datetime.date], rows_per_day: int = 1,
+                    seed: Optional[int] = None, extra_columns: bool = False) -> pd.DataFrame:
+    """
+    Random trades of every port on each of the given days, ``rows_per_day`` per port and day.
+
+    Columns are drawn with vectorized calls, so millions of rows take
+    seconds. With a ``seed`` every value is a hash of the seed, its port,
+    day, row and draw, so a (port, day) block is the same whichever request
+    it is part of: a single fetch, a batch or only the months missing from
+    a cache.
+    """
+    n = len(ports) * len(days) * rows_per_day
+    if seed is None:
+        columns = _draw_columns(np.random.default_rng(), n, extra_columns)
+    else:
+        columns = _draw_columns(_CounterRng(seed, ports, days, rows_per_day), n, extra_columns)
+
+    trade_data = pd.DataFrame({
+        'Trade Date': np.tile(np.repeat(np.array(days, dtype=object), rows_per_day), len(ports)),
+        'Ticker': np.repeat(np.array(ports, dtype=object), len(days) * rows_per_day),
+        **columns,
+    })
+    return trade_data[TRADE_COLUMNS + (EXTRA_COLUMNS if extra_columns else [])]
+
+
+
+def get_trades_data(port: str, report_date: datetime.date, time_period: int,
+                    rows_per_day: int = MOCK_ROWS_PER_DAY, seed: Optional[int] = MOCK_SEED,
+                    extra_columns: bool = MOCK_EXTRA_COLUMNS) -> pd.DataFrame:
 
+    #generating the date list for the trades date column
+    date_list = last_business_days(report_date, time_period)
+    return generate_trades([port], date_list, rows_per_day, seed, extra_columns)
+
+
+
+def get_trades_for_days(ports: List[str], days: List[datetime.date],
+                        rows_per_day: int = MOCK_ROWS_PER_DAY, seed: Optional[int] = MOCK_SEED,
+                        extra_columns: bool = MOCK_EXTRA_COLUMNS) -> pd.DataFrame:
+    """Trades of every port on each of the given days, with the get_trades_data columns."""
+    return generate_trades(ports, days, rows_per_day, seed, extra_columns)
+
+
+
+def get_trades_data_batch(ports: List[str], report_dates: List[datetime.date], time_period: int,
+                          rows_per_day: int = MOCK_ROWS_PER_DAY, seed: Optional[int] = MOCK_SEED,
+                          extra_columns: bool = MOCK_EXTRA_COLUMNS) -> pd.DataFrame:
+    """
+    Trades of every (port, report_date) pair as one long frame.
+
+    Rows have the get_trades_data columns plus 'Report Date', so the frame of a
+    single pair is ``frame[(frame['Ticker'] == port) & (frame['Report Date'] == report_date)]``.
+    """
+    frames = []
+    for report_date in report_dates:
+        days = last_business_days(report_date, time_period)
+        trades = generate_trades(ports, days, rows_per_day, seed, extra_columns)
+        trades.insert(0, 'Report Date', report_date)
+        frames.append(trades)
+    trade_data = pd.concat(frames, ignore_index=True)
+    # port-major order, like fetching each port for each report date in turn
+    order = np.argsort(pd.Index(ports).get_indexer(trade_data['Ticker']), kind="stable")
+    return trade_data.iloc[order].reset_index(drop=True)
@@ -0,0 +1,153 @@
+import asyncio
+import contextlib
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import BaseTool
+
+# A handler receives the tool and the call arguments and returns the ToolMessage content
+ToolHandler = Callable[[BaseTool, dict], Awaitable[Any]]
+
+
+async def invoke_tool(tool: BaseTool, tool_args: dict):
+    """Default handler: invoke the tool and use its output as the message content."""
+    return await tool.ainvoke(tool_args)
+
+
+@dataclass
+class ToolSpec:
+    tool: BaseTool
+    handler: ToolHandler = invoke_tool
+    max_concurrency: Optional[int] = None  # concurrent runs of this tool per event loop
+    timeout: Optional[float] = None  # seconds, falls back to the registry default
+    _semaphores: "weakref.WeakKeyDictionary" = field(default_factory=weakref.WeakKeyDictionary, repr=False)
+
+    @property
+    def name(self) -> str:
+        return self.tool.name
+
+    def semaphore(self) -> Optional[asyncio.Semaphore]:
+        """Return the limiter for the running loop (asyncio primitives are loop bound)."""
+        if not self.max_concurrency:
+            return None
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+
+class ToolRegistry:
+    """
+    Maps tool names to tools and dispatches LLM tool calls to them.
+
+    Every registered tool can have its own concurrency limit and timeout, so a
+    handful of expensive calls cannot hold up cheap ones. Calls to unknown tools
+    and failing calls are answered with an error ToolMessage instead of being
+    dropped, so the model always gets a reply for every tool call id.
+    """
+
+    def __init__(self, default_timeout: Optional[float] = None):
+        self.default_timeout = default_timeout
+        self._specs: Dict[str, ToolSpec] = {}
+
+    def register(self, tool: BaseTool, handler: ToolHandler = invoke_tool,
+                 max_concurrency: Optional[int] = None, timeout: Optional[float] = None) -> BaseTool:
+        """
+        Register a tool for dispatch.
+
+        Args:
+            tool: The tool, its name is used for routing
+            handler: Coroutine turning (tool, args) into the ToolMessage content
+            max_concurrency: Maximum concurrent runs of this tool, None for unlimited
+            timeout: Seconds before a call is cancelled, None for the registry default
+        """
+        if tool.name in self._specs:
+            raise ValueError(f"Tool {tool.name} is already registered")
+        self._specs[tool.name] = ToolSpec(tool, handler, max_concurrency, timeout)
+        return tool
+
+    def tools(self) -> List[BaseTool]:
+        """Return the registered tools in registration order, e.g. for bind_tools."""
+        return [spec.tool for spec in self._specs.values()]
+
+    def __contains__(self, name):
+        return name in self._specs
+
+    def _error(self, tool_call: dict, content: str) -> ToolMessage:
+        return ToolMessage(
+            content=content,
+            tool_call_id=tool_call["id"],
+            name=tool_call["name"],
+            status="error"
+        )
+
+    async def _run(self, spec: ToolSpec, tool_call: dict, timeout: Optional[float]) -> ToolMessage:
+        semaphore = spec.semaphore()
+        async with semaphore if semaphore is not None else contextlib.nullcontext():
+            # the call's own timeout starts once it holds a slot, time queued behind other calls is not counted
+            try:
+                content = await asyncio.wait_for(spec.handler(spec.tool, tool_call["args"]), timeout=timeout)
+            except asyncio.TimeoutError:
+                return self._error(tool_call, f"Tool {spec.name} timed out after {timeout:.1f} seconds")
+        return ToolMessage(
+            content=content,
+            tool_call_id=tool_call["id"],
+            name=tool_call["name"]
+        )
+
+    async def dispatch(self, tool_call: dict, deadline: Optional[float] = None,
+                       timeout: Optional[float] = None) -> ToolMessage:
+        """
+        Run one tool call and wrap the result in a ToolMessage.
+
+        Args:
+            tool_call: Tool call dict with name, args and id
+            deadline: Loop time (``loop.time()``) by which the call must finish, queueing included
+            timeout: Seconds the call may run once started, overrides the tool's and the registry's timeout
+        """
+        spec = self._specs.get(tool_call["name"])
+        if spec is None:
+            return self._error(tool_call, f"Unknown tool {tool_call['name']}")
+
+        if timeout is None:
+            timeout = spec.timeout if spec.timeout is not None else self.default_timeout
+        remaining = None
+        if deadline is not None:
+            remaining = max(0.0, deadline - asyncio.get_running_loop().time())
+
+        try:
+            # wait_for cancels the call (and releases its semaphore) once the deadline passes
+            return await asyncio.wait_for(self._run(spec, tool_call, timeout), timeout=remaining)
+        except asyncio.TimeoutError:
+            return self._error(tool_call, f"Tool {spec.name} timed out after {remaining:.1f} seconds")
+        except Exception as exp:
+            return self._error(tool_call, f"Tool {spec.name} failed: {exp}")
+
+    async def dispatch_all(self, tool_calls: List[dict], max_concurrent: Optional[int] = None,
+                           timeout: Optional[float] = None, call_timeout: Optional[float] = None) -> List[ToolMessage]:
+        """
+        Run tool calls concurrently, returning ToolMessages in the original call order.
+
+        Args:
+            tool_calls: Tool calls from one model message
+            max_concurrent: Maximum calls of this batch running at once, None for unlimited
+            timeout: Seconds the whole batch may take before the remaining calls are cancelled
+            call_timeout: Seconds each call may run once started, None for the per-tool timeouts
+        """
+        deadline = None
+        if timeout is not None:
+            deadline = asyncio.get_running_loop().time() + timeout
+        if not max_concurrent:
+            return list(await asyncio.gather(*(self.dispatch(call, deadline, call_timeout) for call in tool_calls)))
+
+        batch_semaphore = asyncio.Semaphore(max_concurrent)
+
+        async def run(tool_call):
+            async with batch_semaphore:
+                return await self.dispatch(tool_call, deadline, call_timeout)
+
+        return list(await asyncio.gather(*(run(call) for call in tool_calls)))
@@ -8,11 +8,13 @@ from langchain_core.tools import BaseTool
 from langchain_core.tools.base import ArgsSchema
 from pydantic import BaseModel, Field
 import pandas as pd
-from fpdf import FPDF
 import datetime
-from util import state_manager 
+from util.executor import run_blocking
+from .datasets import load_dataset
 
 def create_pdf(client_name, holdings_df):
+    from fpdf import FPDF # deferred, only needed when a report is requested
+
     pdf = FPDF()
     pdf.add_page()
     pdf.set_font("Arial", size=12)
@@ -53,11 +55,7 @@ class ReportTool(BaseTool):
     ) -> pd.DataFrame:
         """Use the tool."""
         try:
-            data_id = repr({
-                'port': port,
-                'report_date': str(report_date)
-            })
-            df = state_manager.get(data_id)
+            df = load_dataset(port, report_date)
             create_pdf(port, df)
         except Exception as exp:
             print(exp)
@@ -69,5 +67,6 @@ class ReportTool(BaseTool):
         run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
     ) -> int:
         """Use the tool asynchronously."""
-        return self._run(port, report_date, run_manager=run_manager.get_sync())
+        # PDF rendering and the file write run on the shared tool pool
+        return await run_blocking(self._run, port, report_date)
     
@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.callbacks import AsyncCallbackManagerForToolRun
+from langchain_core.tools import BaseTool
+
+
+class SearchBackend:
+    """Upstream search provider used by SearchCache, swap in a stub for tests."""
+
+    async def search(self, query: str) -> Any:
+        raise NotImplementedError
+
+
+class ToolBackend(SearchBackend):
+    """Backend calling a search tool that takes a ``query`` argument, e.g. TavilySearchResults."""
+
+    def __init__(self, tool: BaseTool):
+        self.tool = tool
+
+    async def search(self, query: str) -> Any:
+        results = await self.tool.ainvoke({"query": query})
+        if isinstance(results, str):
+            # TavilySearchResults reports API errors as a string, those must not be cached
+            raise RuntimeError(results)
+        return results
+
+
+def _retrieve_exception(task: asyncio.Task):
+    # a request whose callers were all cancelled still finishes, its failure is not an unhandled error
+    if not task.cancelled():
+        task.exception()
+
+
+class SearchCache:
+    """
+    TTL cache in front of a search backend.
+
+    Queries are normalized (case and whitespace) before lookup. Identical
+    queries in flight on the same event loop share one upstream request,
+    which keeps running when the caller that started it is cancelled.
+    """
+
+    def __init__(self, backend: SearchBackend, ttl: float = 300, max_entries: int = 256):
+        """
+        Args:
+            backend: Provider queried on a cache miss
+            ttl: Seconds a result stays valid
+            max_entries: Results kept, least recently used are dropped first
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._results: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0}
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    async def search(self, query: str) -> Any:
+        """Return cached results for the query or fetch them once from the backend."""
+        key = self.normalize(query)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._results.move_to_end(key)
+                self._counters["hits"] += 1
+                return entry[1]
+            inflight = self._inflight.get(key)
+            if inflight is not None and inflight[0] is loop:
+                self._counters["coalesced"] += 1
+                request = inflight[1]
+            else:
+                self._counters["misses"] += 1
+                # the request runs in its own task, owned by no caller, so cancelling
+                # one caller (e.g. a Streamlit rerun) never cancels the others
+                request = loop.create_task(self._fetch(key, query))
+                request.add_done_callback(_retrieve_exception)
+                self._inflight[key] = (loop, request)
+        return await asyncio.shield(request)
+
+    async def _fetch(self, key: str, query: str) -> Any:
+        try:
+            results = await self.backend.search(query)
+            with self._lock:
+                self._results[key] = (time.monotonic() + self.ttl, results)
+                self._results.move_to_end(key)
+                while len(self._results) > self.max_entries:
+                    self._results.popitem(last=False)
+            return results
+        finally:
+            with self._lock:
+                if self._inflight.get(key, (None, None))[1] is asyncio.current_task():
+                    del self._inflight[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counters, entries=len(self._results))
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+
+class CachedSearchTool(BaseTool):
+    """Search tool answering from a SearchCache, with the wrapped tool's name and schema."""
+
+    cache: SearchCache
+    return_direct: bool = False
+
+    @classmethod
+    def from_tool(cls, tool: BaseTool, ttl: float = 300, max_entries: int = 256) -> "CachedSearchTool":
+        return cls(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            cache=SearchCache(ToolBackend(tool), ttl=ttl, max_entries=max_entries),
+        )
+
+    def _run(self, query: str, run_manager=None) -> Any:
+        """Use the tool."""
+        return asyncio.run(self.cache.search(query))
+
+    async def _arun(
+        self, query: str,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> Any:
+        """Use the tool asynchronously."""
+        return await self.cache.search(query)
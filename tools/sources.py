@@ -0,0 +1,279 @@
+import datetime
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import pandas as pd
+from util.executor import run_blocking
+from util.pool import ConnectionPool
+from util.startup import singleton
+from .mocked_data import (EXTRA_COLUMNS, MOCK_EXTRA_COLUMNS, MOCK_ROWS_PER_DAY, MOCK_SEED, TRADE_COLUMNS, get_trades_data,
+                          get_trades_data_batch, get_trades_for_days, last_business_days)
+
+_SQL_COLUMNS = {
+    'Trade Date': 'trade_date', 'CUSIP': 'cusip', 'ISIN': 'isin', 'Bloomberg': 'bloomberg',
+    'Net Money': 'net_money', 'Ticker': 'ticker', 'Sec Desc': 'sec_desc',
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    trade_date TEXT NOT NULL,
+    cusip TEXT,
+    isin TEXT,
+    bloomberg TEXT,
+    net_money INTEGER,
+    ticker TEXT NOT NULL,
+    sec_desc TEXT
+);
+CREATE INDEX IF NOT EXISTS trades_ticker_date ON trades (ticker, trade_date);
+"""
+
+
+class TradesDataSource:
+    """
+    Where portfolio trades come from.
+
+    ``fetch`` returns the trades of one port on the last business day of
+    each of the ``time_period`` months up to ``report_date``, newest first,
+    with the TRADE_COLUMNS columns and whichever EXTRA_COLUMNS the source
+    has. ``fetch_many`` does the same for every
+    (port, report_date) pair in one query and adds a 'Report Date' column.
+    Both are built on ``fetch_months``, the trades of some ports on a set of
+    business month-ends, which is all an adapter has to implement.
+    """
+
+    async def fetch(self, port: str, report_date: datetime.date, time_period: int) -> pd.DataFrame:
+        trade_data = await self.fetch_many([port], [report_date], time_period)
+        return trade_data.drop(columns="Report Date").reset_index(drop=True)
+
+    async def fetch_many(self, ports: List[str], report_dates: List[datetime.date], time_period: int) -> pd.DataFrame:
+        trades = await self.fetch_months(ports, _requested_days(report_dates, time_period))
+        return _assemble(trades, ports, report_dates, time_period)
+
+    async def fetch_months(self, ports: List[str], days: List[datetime.date]) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def _trade_columns(trades: pd.DataFrame) -> List[str]:
+    """TRADE_COLUMNS plus the EXTRA_COLUMNS present in ``trades``, other columns are dropped."""
+    return TRADE_COLUMNS + [column for column in EXTRA_COLUMNS if column in trades.columns]
+
+
+def _assemble(trades: pd.DataFrame, ports: List[str], report_dates: List[datetime.date], time_period: int) -> pd.DataFrame:
+    """Long frame of every (port, report_date) pair from the trades of all requested months."""
+    columns = ['Report Date'] + _trade_columns(trades)
+    frames = []
+    for port in ports:
+        port_trades = trades[trades['Ticker'] == port]
+        for report_date in report_dates:
+            days = last_business_days(report_date, time_period)
+            frame = port_trades[port_trades['Trade Date'].isin(days)]
+            frame = frame.sort_values('Trade Date', ascending=False, kind="stable")
+            frames.append(frame.assign(**{'Report Date': report_date})[columns])
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _requested_days(report_dates: List[datetime.date], time_period: int) -> List[datetime.date]:
+    return sorted({day for report_date in report_dates for day in last_business_days(report_date, time_period)})
+
+
+class MockTradesSource(TradesDataSource):
+    """Random trades from tools.mocked_data, the default for development."""
+
+    def __init__(self, rows_per_day: int = MOCK_ROWS_PER_DAY, seed: Optional[int] = MOCK_SEED,
+                 extra_columns: bool = MOCK_EXTRA_COLUMNS):
+        """
+        Args:
+            rows_per_day: Trades generated per port and month-end
+            seed: Fixed seed for reproducible trades, None for random ones
+            extra_columns: Add the EXTRA_COLUMNS columns
+        """
+        self.options = {"rows_per_day": rows_per_day, "seed": seed, "extra_columns": extra_columns}
+
+    async def fetch(self, port, report_date, time_period):
+        return await run_blocking(get_trades_data, port, report_date, time_period, **self.options)
+
+    async def fetch_many(self, ports, report_dates, time_period):
+        return await run_blocking(get_trades_data_batch, ports, report_dates, time_period, **self.options)
+
+    async def fetch_months(self, ports, days):
+        return await run_blocking(get_trades_for_days, ports, days, **self.options)
+
+
+class SqliteTradesSource(TradesDataSource):
+    """
+    Trades in a SQLite ``trades`` table, queried through a connection pool.
+
+    Queries run on the shared tool executor, never on the event loop thread.
+    Every fetch_many is a single query for all ports and months.
+    """
+
+    def __init__(self, path: str = "trades.sqlite", pool_size: int = 4):
+        """
+        Args:
+            path: SQLite database file, created with an empty trades table if it does not exist
+            pool_size: Connections kept open and shared by concurrent fetches
+        """
+        self.path = path
+        self.pool = ConnectionPool(self._connect, size=pool_size)
+        with self.pool.connection() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def write(self, trades: pd.DataFrame):
+        """Append trades with the TRADE_COLUMNS columns, e.g. to seed a reference database."""
+        rows = trades[TRADE_COLUMNS].rename(columns=_SQL_COLUMNS)
+        rows['trade_date'] = pd.to_datetime(rows['trade_date']).dt.strftime("%Y-%m-%d")
+        with self.pool.connection() as conn:
+            rows.to_sql("trades", conn, if_exists="append", index=False)
+            conn.commit()
+
+    def _query(self, ports: List[str], days: List[datetime.date]) -> pd.DataFrame:
+        sql = (
+            f"SELECT {', '.join(f'{column} AS [{name}]' for name, column in _SQL_COLUMNS.items())} FROM trades "
+            f"WHERE ticker IN ({', '.join('?' * len(ports))}) AND trade_date IN ({', '.join('?' * len(days))})"
+        )
+        with self.pool.connection() as conn:
+            trades = pd.read_sql_query(sql, conn, params=[*ports, *(day.isoformat() for day in days)])
+        trades['Trade Date'] = pd.to_datetime(trades['Trade Date']).dt.date
+        return trades
+
+    async def fetch_months(self, ports, days):
+        return await run_blocking(self._query, ports, days)
+
+    def close(self):
+        self.pool.close()
+
+
+class ParquetTradesSource(TradesDataSource):
+    """
+    Trades in a Parquet file or directory with the TRADE_COLUMNS columns,
+    EXTRA_COLUMNS found in the file are returned too.
+
+    Port and date filters are pushed down to the reader, so only the row
+    groups that hold the requested trades are read.
+    """
+
+    def __init__(self, path: str = "trades.parquet"):
+        self.path = path
+        self._schema_columns: Optional[List[str]] = None
+
+    def _columns(self) -> List[str]:
+        if self._schema_columns is None:
+            import pyarrow.dataset  # only needed by this source
+            names = pyarrow.dataset.dataset(self.path, format="parquet").schema.names
+            self._schema_columns = TRADE_COLUMNS + [column for column in EXTRA_COLUMNS if column in names]
+        return self._schema_columns
+
+    def _query(self, ports: List[str], days: List[datetime.date]) -> pd.DataFrame:
+        trades = pd.read_parquet(
+            self.path, columns=self._columns(),
+            filters=[('Ticker', 'in', ports), ('Trade Date', 'in', days)],
+        )
+        trades['Trade Date'] = pd.to_datetime(trades['Trade Date']).dt.date
+        return trades
+
+    async def fetch_months(self, ports, days):
+        return await run_blocking(self._query, ports, days)
+
+
+class CachingTradesSource(TradesDataSource):
+    """
+    Month-level cache in front of another source.
+
+    Fetched rows are indexed by (port, business month-end). A request only
+    fetches the months not cached yet and assembles its window from cached
+    pieces, so stepping through consecutive report dates of a port fetches
+    one new month each time instead of the whole window. At most
+    ``max_months`` (port, month) pieces are kept, least recently used first out.
+    """
+
+    def __init__(self, source: TradesDataSource, max_months: int = 5000):
+        """
+        Args:
+            source: Source the missing months are fetched from
+            max_months: (port, month-end) pieces kept
+        """
+        self.source = source
+        self.max_months = max_months
+        self._months: "OrderedDict[Tuple[str, datetime.date], pd.DataFrame]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"months_cached": 0, "months_fetched": 0}
+
+    async def fetch_months(self, ports, days):
+        pieces = {}
+        with self._lock:
+            for key in ((port, day) for port in ports for day in days):
+                if key in self._months:
+                    self._months.move_to_end(key)
+                    pieces[key] = self._months[key]
+            self._counters["months_cached"] += len(pieces)
+        missing_ports = [port for port in ports if any((port, day) not in pieces for day in days)]
+        missing_days = [day for day in days if any((port, day) not in pieces for port in ports)]
+
+        if missing_ports:
+            fetched = await self.source.fetch_months(missing_ports, missing_days)
+            groups = dict(iter(fetched.groupby(['Ticker', 'Trade Date'], sort=False)))
+            empty = fetched.iloc[0:0]
+            with self._lock:
+                for key in ((port, day) for port in missing_ports for day in missing_days):
+                    if key in pieces:
+                        continue
+                    # months without trades are cached too, so they are not asked for again
+                    pieces[key] = self._months.setdefault(key, groups.get(key, empty))
+                    self._months.move_to_end(key)
+                    self._counters["months_fetched"] += 1
+                while len(self._months) > self.max_months:
+                    self._months.popitem(last=False)
+
+        frames = [pieces[(port, day)] for port in ports for day in days]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=TRADE_COLUMNS)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "months": len(self._months)}
+
+    def close(self):
+        self.source.close()
+
+
+def create_trades_source(source: Optional[str] = None) -> TradesDataSource:
+    """
+    Build the trades source selected by ``source`` or the TRADES_SOURCE env var.
+
+    Supported sources are ``mock`` (random data), ``sqlite`` (configured with
+    TRADES_DB and TRADES_POOL_SIZE) and ``parquet`` (configured with TRADES_PARQUET).
+    The source is wrapped in a CachingTradesSource of TRADES_CACHE_MONTHS
+    (port, month) pieces unless it is set to 0.
+    """
+    source = (source or os.getenv("TRADES_SOURCE", "mock")).lower()
+    if source == "mock":
+        trades_source = MockTradesSource()
+    elif source == "sqlite":
+        trades_source = SqliteTradesSource(
+            path=os.getenv("TRADES_DB", "trades.sqlite"),
+            pool_size=int(os.getenv("TRADES_POOL_SIZE", "4")),
+        )
+    elif source == "parquet":
+        trades_source = ParquetTradesSource(path=os.getenv("TRADES_PARQUET", "trades.parquet"))
+    else:
+        raise ValueError(f"Unknown trades source {source}")
+
+    max_months = int(os.getenv("TRADES_CACHE_MONTHS", "5000"))
+    return CachingTradesSource(trades_source, max_months=max_months) if max_months else trades_source
+
+
+@singleton("trades source")
+def get_trades_source() -> TradesDataSource:
+    return create_trades_source()
@@ -0,0 +1,264 @@
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from util.executor import run_blocking
+
+## Curated question bank, one entry per finance intent.
+## "queries" are example user questions the intent answers, "followups" are the suggestions.
+QUESTION_BANK = {
+    "performance": {
+        "queries": [
+            "Show me the performance data of the fund.",
+            "How did the fund perform this year?",
+            "What are the returns of the portfolio?",
+            "Fetch the trades data for the fund",
+        ],
+        "followups": [
+            "What drove the fund's returns over the period?",
+            "How does this performance compare to the benchmark?",
+            "Can you chart the monthly net money for this fund?",
+            "What is the fund's year-to-date return?",
+        ],
+    },
+    "attribution": {
+        "queries": [
+            "Can you explain the fund attribution?",
+            "Which holdings contributed most to returns?",
+            "What is the sector allocation effect?",
+        ],
+        "followups": [
+            "Which securities contributed most to performance?",
+            "How much of the return came from allocation versus selection?",
+            "How has the attribution changed over the last quarter?",
+        ],
+    },
+    "risk": {
+        "queries": [
+            "What are the risk metrics of this fund?",
+            "What is the volatility and drawdown of the portfolio?",
+            "Show me the sharpe ratio and beta",
+        ],
+        "followups": [
+            "What is the maximum drawdown over the last year?",
+            "How does the fund's volatility compare to the benchmark?",
+            "What is the fund's Sharpe ratio?",
+        ],
+    },
+    "benchmark": {
+        "queries": [
+            "How has this fund performed vs the benchmark?",
+            "Compare returns of two funds over 5 years.",
+            "Is the fund beating its index?",
+        ],
+        "followups": [
+            "What is the tracking error against the benchmark?",
+            "In which months did the fund underperform the benchmark?",
+            "Can you compare this fund with another portfolio?",
+        ],
+    },
+}
+
+_STOPWORDS = {
+    "a", "an", "and", "are", "can", "did", "do", "does", "for", "from", "has", "have", "how",
+    "i", "in", "is", "it", "me", "my", "of", "on", "over", "please", "show", "tell", "that",
+    "the", "this", "to", "vs", "versus", "was", "what", "which", "with", "you", "your",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords and with a crude plural/verb suffix strip."""
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in _STOPWORDS or len(word) < 2:
+            continue
+        for suffix in ("ing", "ed", "s"):
+            if len(word) > len(suffix) + 3 and word.endswith(suffix):
+                word = word[: -len(suffix)]
+                break
+        tokens.append(word)
+    return tokens
+
+
+class SuggestionEngine:
+    """
+    Offline follow-up suggestion ranking.
+
+    Past user queries (curated examples and queries learned from LLM answers)
+    are kept in a TF-IDF index. Each indexed query carries weighted follow-up
+    candidates; a new query scores every candidate by the squared cosine
+    similarity of the queries it is attached to. Clicks on a suggestion raise its weight for
+    similar queries. The similarity of the best match is the confidence, below
+    ``threshold`` callers should fall back to the LLM.
+    """
+
+    def __init__(self, bank: Dict[str, dict] = QUESTION_BANK, threshold: float = 0.35,
+                 max_documents: int = 5000, path: Optional[str] = None):
+        """
+        Args:
+            bank: Curated intents with example queries and follow-ups
+            threshold: Minimum similarity of the best indexed query to answer offline
+            max_documents: Learned queries kept, oldest are dropped first
+            path: JSON file the learned queries and the clicks are loaded from and saved to
+        """
+        self.threshold = threshold
+        self.max_documents = max_documents
+        self.path = path
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()  # one writer at a time, so an older snapshot never replaces a newer one
+        self._documents: Dict[str, dict] = {}  # normalized query -> {"tokens", "followups", "curated"}
+        self._postings: Dict[str, set] = defaultdict(set)  # token -> normalized queries
+        self._norms: Dict[str, float] = {}  # cached document norms, cleared when idf changes
+        self._clicks: Dict[str, Dict[str, float]] = defaultdict(dict)  # curated query -> click weight per follow-up
+
+        for intent in bank.values():
+            # the follow-ups are questions of the same intent, so they are indexed as queries too
+            for query in intent["queries"] + intent["followups"]:
+                self._add(query, intent["followups"], curated=True)
+        if path and os.path.exists(path):
+            self.load(path)
+
+    @staticmethod
+    def _key(query: str) -> str:
+        return " ".join(query.lower().split()).rstrip("?.! ")
+
+    def _idf(self, token: str) -> float:
+        return math.log((len(self._documents) + 1) / (len(self._postings.get(token, ())) + 1)) + 1
+
+    def _norm(self, key: str) -> float:
+        if key not in self._norms:
+            counts = Counter(self._documents[key]["tokens"])
+            self._norms[key] = math.sqrt(sum((tf * self._idf(t)) ** 2 for t, tf in counts.items())) or 1.0
+        return self._norms[key]
+
+    def _add(self, query: str, followups: List[str], curated: bool = False, weight: float = 1.0):
+        key = self._key(query)
+        document = self._documents.get(key)
+        if document is None:
+            tokens = tokenize(query)
+            if not tokens:
+                return
+            document = {"query": query, "tokens": tokens, "followups": {}, "curated": curated}
+            self._documents[key] = document
+            for token in set(tokens):
+                self._postings[token].add(key)
+            self._norms.clear()
+        for followup in followups:
+            document["followups"][followup] = document["followups"].get(followup, 0.0) + weight
+        self._trim()
+
+    def _remove(self, key: str):
+        document = self._documents.pop(key)
+        for token in set(document["tokens"]):
+            self._postings[token].discard(key)
+            if not self._postings[token]:
+                del self._postings[token]
+        self._norms.clear()
+
+    def _trim(self):
+        learned = [key for key, document in self._documents.items() if not document["curated"]]
+        for key in learned[: max(0, len(learned) - self.max_documents)]:
+            self._remove(key)
+
+    def rank(self, query: str, limit: int = 3) -> Tuple[List[str], float]:
+        """Return the best follow-ups for a query and the confidence of the match."""
+        counts = Counter(tokenize(query))
+        if not counts:
+            return [], 0.0
+        with self._lock:
+            weights = {t: tf * self._idf(t) for t, tf in counts.items()}
+            query_norm = math.sqrt(sum(w * w for w in weights.values()))
+            dots: Dict[str, float] = defaultdict(float)
+            for token, weight in weights.items():
+                for key in self._postings.get(token, ()):
+                    tf = self._documents[key]["tokens"].count(token)
+                    dots[key] += weight * tf * self._idf(token)
+            if not dots:
+                return [], 0.0
+
+            similarities = {key: dot / (query_norm * self._norm(key)) for key, dot in dots.items()}
+            scores: Dict[str, float] = defaultdict(float)
+            own_key = self._key(query)
+            for key, similarity in similarities.items():
+                for followup, weight in self._documents[key]["followups"].items():
+                    if self._key(followup) != own_key:
+                        scores[followup] += similarity ** 2 * weight  # squared, close matches dominate
+            ranked = sorted(scores, key=scores.get, reverse=True)[:limit]
+            return ranked, max(similarities.values())
+
+    def suggest(self, query: str, limit: int = 3) -> Optional[List[str]]:
+        """Return follow-ups when the engine is confident, None when the LLM should be asked."""
+        ranked, confidence = self.rank(query, limit)
+        if confidence < self.threshold or len(ranked) < limit:
+            return None
+        return ranked
+
+    def learn(self, query: str, followups: List[str]):
+        """Index a query with the follow-ups produced for it (e.g. by the LLM fallback)."""
+        with self._lock:
+            self._add(query, followups)
+        if self.path:
+            self.save()
+
+    async def alearn(self, query: str, followups: List[str]):
+        """Like learn, the bank is saved on the tool executor instead of the event loop."""
+        with self._lock:
+            self._add(query, followups)
+        if self.path:
+            await run_blocking(self.save)
+
+    def record_click(self, query: str, followup: str, weight: float = 2.0):
+        """Feedback from the UI: ``followup`` was clicked after ``query`` was answered."""
+        with self._lock:
+            self._add(query, [followup], weight=weight)
+            self._remember_click(query, followup, weight)
+        if self.path:
+            self.save()
+
+    def _remember_click(self, query: str, followup: str, weight: float):
+        # learned documents are saved with all their weights, curated ones only with what clicks added
+        key = self._key(query)
+        document = self._documents.get(key)
+        if document is not None and document["curated"]:
+            self._clicks[key][followup] = self._clicks[key].get(followup, 0.0) + weight
+
+    def save(self, path: Optional[str] = None):
+        """
+        Write the learned queries and the clicks on curated queries (not the
+        curated bank itself) to a JSON file.
+
+        The file is written next to the target and renamed over it, so
+        readers never see a partly written bank.
+        """
+        path = path or self.path
+        with self._save_lock:
+            with self._lock:
+                learned = [
+                    {"query": document["query"], "followups": dict(document["followups"])}
+                    for document in self._documents.values() if not document["curated"]
+                ] + [
+                    {"query": self._documents[key]["query"], "followups": dict(clicks)}
+                    for key, clicks in self._clicks.items() if key in self._documents
+                ]
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(learned, f)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+    def load(self, path: str):
+        with open(path) as f:
+            learned = json.load(f)
+        with self._lock:
+            for document in learned:
+                for followup, weight in document["followups"].items():
+                    self._add(document["query"], [followup], weight=weight)
+                    self._remember_click(document["query"], followup, weight)
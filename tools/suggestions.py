@@ -1,15 +1,61 @@
+import asyncio
+import os
+import threading
+from collections import OrderedDict
 import streamlit as st
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
+from tools.suggestion_engine import SuggestionEngine
+from util.event_loop import get_background_loop
+from util.startup import singleton
 
 # Load environment variables
 load_dotenv()
 
-def suggest_followups(user_query):
-    """
-    Use Together API-compatible GPT model to suggest follow-up questions for a financial chatbot.
-    """
-    prompt = f"""
+STARTER_PROMPTS = [
+    "Show me the performance data of SEL-AGG.",
+    "What are the risk metrics of this fund?",
+    "Can you explain the fund attribution?",
+    "Compare returns of two funds over 5 years.",
+    "How has this fund performed vs the benchmark?"
+]
+
+SUGGESTION_CACHE_SIZE = 1024 # normalized queries whose suggestions are kept
+SUGGESTION_CONFIDENCE = float(os.getenv("SUGGESTION_CONFIDENCE", "0.35")) # below this the LLM is asked instead of the local engine
+SUGGESTION_BANK = os.getenv("SUGGESTION_BANK", "") # JSON file for learned queries, empty keeps them in memory
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+@singleton("suggestion model")
+def get_suggestion_llm():
+    """Shared client, reused by every suggestion call instead of built per call."""
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model="gpt-4.1-nano",
+        temperature=0.7,
+        max_tokens=100
+    )
+
+
+@singleton("suggestion engine")
+def get_suggestion_engine() -> SuggestionEngine:
+    """Local ranking over the curated and learned question bank, tried before the LLM."""
+    return SuggestionEngine(threshold=SUGGESTION_CONFIDENCE, path=SUGGESTION_BANK or None)
+
+
+def record_followup_click(user_query, followup):
+    """Called when a suggested follow-up is clicked, so it ranks higher for similar queries."""
+    get_suggestion_engine().record_click(user_query, followup)
+
+
+def normalize_query(user_query):
+    return " ".join(user_query.lower().split()).rstrip("?.! ")
+
+
+def _prompt(user_query):
+    return f"""
     The user asked: "{user_query}"
 
     Based on this, suggest 3 intelligent follow-up questions related to finance data or user query,
@@ -17,25 +63,80 @@ def suggest_followups(user_query):
 
     Only return the questions in a bullet list.
     """
-    llm = ChatOpenAI(
-        model="gpt-4.1-nano",
-        temperature=0.7,
-        max_tokens=100
-    )
-    response = llm.invoke(prompt)
+
+
+def _parse(content):
     # Process the response and filter out unwanted lines like "Here are three intelligent follow-up questions"
-    raw_lines = response.content.strip().split("\n")
+    raw_lines = content.strip().split("\n")
 
     # Only return lines that appear to be actual questions, removing introductory text
-    follow_up_questions = [
+    return [
         line.lstrip("•-1234567890. ").strip()  # Removes bullet points, numbers, etc.
         for line in raw_lines
         if "?" in line and len(line.strip()) > 5
     ]
-    
+
+
+def _cached(key):
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return list(_cache[key])
+    return None
+
+
+def _remember(key, questions):
+    if not questions:
+        return
+    with _cache_lock:
+        _cache[key] = list(questions)
+        _cache.move_to_end(key)
+        while len(_cache) > SUGGESTION_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def suggest_followups(user_query):
+    """
+    Suggest follow-up questions for a financial chatbot.
+
+    The local suggestion engine answers when it is confident, otherwise the
+    GPT model is asked and its answer is learned by the engine.
+    """
+    key = normalize_query(user_query)
+    if (cached := _cached(key)) is not None:
+        return cached
+    if (local := get_suggestion_engine().suggest(user_query)) is not None:
+        return local
+    response = get_suggestion_llm().invoke(_prompt(user_query))
+    follow_up_questions = _parse(response.content)
+    _remember(key, follow_up_questions)
+    get_suggestion_engine().learn(user_query, follow_up_questions)
+    return follow_up_questions
+
+
+async def asuggest_followups(user_query):
+    """Async version of suggest_followups, meant to run alongside the graph on the background loop."""
+    key = normalize_query(user_query)
+    if (cached := _cached(key)) is not None:
+        return cached
+    if (local := get_suggestion_engine().suggest(user_query)) is not None:
+        return local
+    response = await get_suggestion_llm().ainvoke(_prompt(user_query))
+    follow_up_questions = _parse(response.content)
+    _remember(key, follow_up_questions)
+    await get_suggestion_engine().alearn(user_query, follow_up_questions)
     return follow_up_questions
 
 
+@singleton("suggestion prewarm")
+def prewarm_suggestions():
+    """Fill the cache for the starter prompts once per process, in the background."""
+    async def prewarm():
+        await asyncio.gather(*(asuggest_followups(prompt) for prompt in STARTER_PROMPTS), return_exceptions=True)
+
+    return get_background_loop().submit(prewarm())
+
+
 def suggestion_ui_element(prompts, col_length=2, run_llm=None):
     cols = st.columns(col_length)
     for i, prompt in enumerate(prompts):
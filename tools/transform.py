@@ -0,0 +1,259 @@
+import datetime
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+## Deterministic fast path for common dataframe transformations.
+## Prompts like "sum net money by month" or "top 5 trades by net money where ticker is SEL"
+## are parsed into a TransformPlan and run directly with pandas, anything else returns None
+## so the caller can fall back to the pandas agent.
+
+_AGGREGATES = {
+    "sum": "sum", "total": "sum", "average": "mean", "avg": "mean", "mean": "mean",
+    "median": "median", "max": "max", "maximum": "max", "highest": "max",
+    "min": "min", "minimum": "min", "lowest": "min", "count": "count", "number of": "count",
+}
+_AGGREGATE = "|".join(sorted(map(re.escape, _AGGREGATES), key=len, reverse=True))
+
+_OPERATORS = {
+    ">=": "ge", "at least": "ge", "<=": "le", "at most": "le", "!=": "ne", "is not": "ne", "not": "ne",
+    "==": "eq", "=": "eq", "is": "eq", "equals": "eq", "equal to": "eq",
+    ">": "gt", "above": "gt", "over": "gt", "greater than": "gt", "more than": "gt", "after": "gt",
+    "<": "lt", "below": "lt", "under": "lt", "less than": "lt", "before": "lt",
+    "contains": "contains", "containing": "contains", "like": "contains",
+}
+_OPERATOR = "|".join(sorted(map(re.escape, _OPERATORS), key=len, reverse=True))
+## A filter value with one of these in it most likely swallowed another condition ("a1b2 or net money over 5m")
+_OPERATOR_WORDS = sorted({word for operator in _OPERATORS for word in operator.split() if word.isalpha()})
+_UNCLEAR_VALUE = re.compile(rf"[,<>=!]|\b(?:or|where|{'|'.join(_OPERATOR_WORDS)})\b")
+
+_ROWS = r"(?:trades|rows|records|entries)"
+_LEADING = re.compile(
+    r"^(?:please |can you |could you |pls )*(?:show(?: me)?|give(?: me)?|get|list|display|calculate|compute|"
+    r"find|return|tell me|what is|what are|what's|what were|i want|i need)? ?(?:the |a |an )?"
+)
+_TRAILING = re.compile(r"(?: please| for (?:this|the|that) (?:fund|portfolio|port|data|dataframe|table))+$")
+
+## Columns derived from the first date column, usable like real ones
+_DERIVED = {"month": "M", "quarter": "Q", "year": "Y"}
+_DERIVED_VALUES = {"month": r"\d{4}-\d{2}", "quarter": r"\d{4}q[1-4]", "year": r"\d{4}"}  # lowercased period strings
+
+
+@dataclass
+class TransformPlan:
+    """A parsed transformation, applied by ``apply_plan``."""
+
+    op: str  # aggregate, count, top, sort, pivot or filter
+    filters: List[Tuple[str, str, Any]] = field(default_factory=list)  # (column, operator, value)
+    column: Optional[str] = None
+    agg: str = "sum"
+    groups: List[str] = field(default_factory=list)
+    pivot_columns: Optional[str] = None
+    n: Optional[int] = None
+    ascending: Optional[bool] = None  # None keeps the group order
+
+
+def _normalize(prompt: str) -> str:
+    prompt = re.sub(r"[?!.;:]+$", "", prompt.strip().lower())
+    prompt = re.sub(r"\s+", " ", prompt.replace(",", " , ")).strip()
+    prompt = _LEADING.sub("", prompt)
+    return _TRAILING.sub("", prompt).strip(" ,")
+
+
+def _date_column(columns: List[str]) -> Optional[str]:
+    return next((column for column in columns if "date" in column.lower()), None)
+
+
+def _column_names(columns: List[str]) -> Dict[str, str]:
+    """Lowercase spellings a prompt may use -> column, derived date parts included."""
+    names = {}
+    for column in columns:
+        spelled = column.lower()
+        names[spelled] = column
+        names[spelled.replace(" ", "_")] = column
+        names[spelled.replace(" ", "")] = column
+    if _date_column(columns) is not None:
+        for part in _DERIVED:
+            names.setdefault(part, part)
+            names.setdefault(part + "s", part)
+        names.setdefault("date", _date_column(columns))
+    return names
+
+
+def _parse_value(raw: str):
+    raw = raw.strip().strip("'\"")
+    number = re.fullmatch(r"\$?(-?[\d,]*\.?\d+)\s*(k|m|mn|million|bn|b|billion)?", raw)
+    if number:
+        value = float(number.group(1).replace(",", ""))
+        scale = {"k": 1e3, "m": 1e6, "mn": 1e6, "million": 1e6, "b": 1e9, "bn": 1e9, "billion": 1e9}
+        value *= scale.get(number.group(2) or "", 1)
+        return int(value) if value.is_integer() else value
+    return raw
+
+
+def _parse_filter(column: str, operator: str, raw: str) -> Optional[Tuple[str, str, Any]]:
+    """(column, operator, value) of a filter clause, None when the value cannot be trusted."""
+    if _UNCLEAR_VALUE.search(raw):
+        return None
+    value = _parse_value(raw)
+    if column in _DERIVED and operator != "contains" and not re.fullmatch(_DERIVED_VALUES[column], str(value)):
+        return None  # e.g. "month is may", derived parts are compared as "2025-05" strings
+    return column, operator, value
+
+
+def parse_prompt(prompt: str, columns: List[str]) -> Optional[TransformPlan]:
+    """Plan for a prompt over a frame with ``columns``, None when the prompt is not understood."""
+    names = _column_names(columns)
+    column = "|".join(sorted(map(re.escape, names), key=len, reverse=True))
+    groups = rf"(?P<groups>(?:{column})(?: (?:and|,) (?:{column}))*)"
+    text = _normalize(prompt)
+
+    filters = []
+    filter_clause = re.compile(
+        rf"(?:^| )(?:where|with|when|for|if|filter(?:ed)?(?: to| on| by)?|only|and)"
+        rf" (?P<column>{column}) (?P<operator>{_OPERATOR}) (?P<value>.+?)"
+        rf"(?= (?:and|then|by|per|sorted|sort|order|ordered|grouped) |$| ,)"
+    )
+    while (match := filter_clause.search(text)) is not None:
+        parsed = _parse_filter(names[match.group("column")], _OPERATORS[match.group("operator")], match.group("value"))
+        if parsed is None:
+            return None
+        filters.append(parsed)
+        text = (text[:match.start()] + text[match.end():]).strip(" ,")
+        text = re.sub(r" (?:and|,)$", "", text)
+
+    sort_suffix = r"(?: ,)?(?: (?:sorted|ordered|sort|order))?(?: (?:by value|by it))?(?: (?P<direction>asc(?:ending)?|desc(?:ending)?|highest first|largest first|lowest first|smallest first))?"
+    patterns = [
+        ("aggregate", rf"(?P<agg>{_AGGREGATE}) (?:of )?(?:the )?(?P<column>{column})(?: (?:by|per|for each|for every|grouped by|group by|across) {groups})?{sort_suffix}"),
+        ("aggregate", rf"(?P<column>{column}) (?P<agg>{_AGGREGATE})(?: (?:by|per|for each|grouped by|across) {groups})?{sort_suffix}"),
+        ("aggregate", rf"group(?:ed)? (?:by )?{groups} (?:and )?(?P<agg>{_AGGREGATE}) (?:of )?(?:the )?(?P<column>{column}){sort_suffix}"),
+        ("count", rf"(?:count(?: of)?|number of|how many)(?: {_ROWS})?(?: (?:are there|do we have))?(?: (?:by|per|for each|grouped by) {groups})?{sort_suffix}"),
+        ("top", rf"(?P<direction>top|bottom|largest|smallest|highest|lowest|biggest) (?P<n>\d+)(?: {_ROWS})?(?: (?:by|on|of|in) (?:the )?(?P<column>{column}))?"),
+        ("top", rf"(?P<n>\d+) (?P<direction>largest|smallest|highest|lowest|biggest) (?:(?P<column>{column})|{_ROWS})(?: (?:by|on|of|in) (?:the )?(?P<sort_column>{column}))?"),
+        ("sort", rf"(?:sort|order)(?: (?:the )?(?:data|{_ROWS}|table))? by (?P<column>{column})(?: (?P<direction>asc(?:ending)?|desc(?:ending)?|highest first|largest first|lowest first|smallest first))?"),
+        ("pivot", rf"pivot(?: table)?(?: of)?(?: (?P<agg>{_AGGREGATE}))?(?: of)? (?P<column>{column}) (?:by|with) (?P<index>{column}) (?:and|vs|across|by) (?P<pivot_columns>{column})"),
+        ("filter", rf"(?:all |the )?(?:{_ROWS}|data)?"),
+    ]
+    for op, pattern in patterns:
+        match = re.fullmatch(pattern, text)
+        if match is None:
+            continue
+        found = match.groupdict()
+        plan = TransformPlan(op=op, filters=filters)
+        if found.get("sort_column"):
+            plan.column = names[found["sort_column"]]
+        elif found.get("column"):
+            plan.column = names[found["column"]]
+        if found.get("agg"):
+            plan.agg = _AGGREGATES[found["agg"]]
+        if op == "count":
+            plan.agg = "count"
+        if found.get("groups"):
+            plan.groups = [names[name] for name in re.split(r" (?:and|,) ", found["groups"])]
+        if found.get("index"):
+            plan.groups = [names[found["index"]]]
+            plan.pivot_columns = names[found["pivot_columns"]]
+        if found.get("n"):
+            plan.n = int(found["n"])
+        direction = found.get("direction")
+        if direction:
+            plan.ascending = direction.startswith(("asc", "bottom", "smallest", "lowest"))
+        elif op in ("top", "sort"):
+            plan.ascending = op == "sort"
+        if op == "filter" and not filters:
+            return None
+        return plan
+    return None
+
+
+def _resolve(df: pd.DataFrame, column: str) -> pd.Series:
+    if column in df.columns:
+        return df[column]
+    dates = pd.to_datetime(df[_date_column(list(df.columns))])
+    return dates.dt.to_period(_DERIVED[column]).astype(str).rename(column)
+
+
+def _compare(series: pd.Series, operator: str, value) -> pd.Series:
+    if operator == "contains":
+        return series.astype(str).str.contains(str(value), case=False, regex=False)
+    if pd.api.types.is_numeric_dtype(series) and not isinstance(value, (int, float)):
+        raise ValueError(f"{value!r} is not a number")
+    if not pd.api.types.is_numeric_dtype(series):
+        if "date" in str(series.name).lower():
+            series, value = pd.to_datetime(series), pd.Timestamp(str(value))
+        elif operator in ("eq", "ne"):
+            series, value = series.astype(str).str.lower(), str(value).lower()
+    return getattr(series, operator)(value)
+
+
+def apply_plan(df: pd.DataFrame, plan: TransformPlan):
+    """
+    Run a plan over a frame, vectorized. Returns a DataFrame, a Series or a scalar.
+
+    Raises ValueError when a text equality filter matches no row, the value
+    is more likely misread than absent from the data.
+    """
+    for column, operator, value in plan.filters:
+        mask = _compare(_resolve(df, column), operator, value)
+        if operator == "eq" and isinstance(value, str) and not mask.any():
+            raise ValueError(f"no {column} is {value!r}")
+        df = df[mask]
+
+    if plan.op == "filter":
+        return df.reset_index(drop=True)
+
+    if plan.op == "sort":
+        order = _resolve(df, plan.column).sort_values(ascending=plan.ascending, kind="stable").index
+        return df.loc[order].reset_index(drop=True)
+
+    if plan.op == "top":
+        column = plan.column or df.select_dtypes("number").columns[0]
+        values = _resolve(df, column)
+        picked = values.nsmallest(plan.n) if plan.ascending else values.nlargest(plan.n)
+        return df.loc[picked.index].reset_index(drop=True)
+
+    if plan.op == "pivot":
+        index, columns = _resolve(df, plan.groups[0]), _resolve(df, plan.pivot_columns)
+        return pd.pivot_table(
+            pd.DataFrame({"index": index, "columns": columns, "values": _resolve(df, plan.column)}),
+            index="index", columns="columns", values="values", aggfunc=plan.agg, fill_value=0,
+        ).rename_axis(index=index.name, columns=columns.name)
+
+    # aggregate and count
+    values = _resolve(df, plan.column) if plan.column else pd.Series(1, index=df.index, name="Count")
+    if not plan.groups:
+        return len(df) if plan.op == "count" else values.agg(plan.agg)
+    keys = [_resolve(df, group) for group in plan.groups]
+    result = values.groupby(keys, sort=True).agg(plan.agg)
+    if plan.op == "count":
+        result = result.rename("Count")
+    if plan.ascending is not None:
+        result = result.sort_values(ascending=plan.ascending, kind="stable")
+    return result.reset_index()
+
+
+def fast_transform(df: pd.DataFrame, prompt: str):
+    """Result of a prompt the fast path understands, None to fall back to the agent."""
+    plan = parse_prompt(prompt, list(df.columns))
+    if plan is None:
+        return None
+    try:
+        return apply_plan(df, plan)
+    except (KeyError, ValueError, TypeError, IndexError):
+        return None  # e.g. a text value compared to a number column
+
+
+def format_result(result, max_rows: int = 50) -> str:
+    """Text for the tool message, long frames are cut to ``max_rows`` rows."""
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        text = result.head(max_rows).to_string(index=isinstance(result, pd.Series) or result.index.name is not None)
+        if len(result) > max_rows:
+            text += f"\n... {len(result) - max_rows} more rows"
+        return text
+    if isinstance(result, float):
+        return f"{result:,.2f}"
+    if isinstance(result, (datetime.date, pd.Timestamp)):
+        return result.isoformat()
+    return str(result)
@@ -1,16 +1,22 @@
 import streamlit as st
 import datetime
 import uuid
-import asyncio
-from chatgraph import Graph
-from langchain_core.messages import HumanMessage, AIMessageChunk, SystemMessage
+import pyarrow as pa
+from chatgraph import STREAM_EVENT_NAMES, STREAM_EVENT_TYPES, Graph, get_checkpointer
+from langchain_core.messages import AIMessageChunk
 from util import state_manager
+from util.event_loop import get_background_loop
 from tools.chart import generate_chart
+from tools.datasets import load_dataset
 from st_ui.dashboard import dashboard_ui
-from tools.suggestions import suggest_followups
+from tools.suggestions import STARTER_PROMPTS, asuggest_followups, prewarm_suggestions, record_followup_click
 
 graph = Graph().get()
 APP_NAME = "FolioPilot"
+HISTORY_TURNS = 5 # turns rendered per history page
+SUGGESTION_TIMEOUT = 10 # seconds to wait for follow-ups once the answer is rendered
+
+prewarm_suggestions()
 
 st.set_page_config(
     page_title=APP_NAME,
@@ -36,12 +42,23 @@ def create_new_chat():
     st.session_state.current_chat_id = new_chat_id
     st.session_state.chat_sessions[new_chat_id] = {
         "messages": [],
-        "checkpoint_id": None,
+        "checkpoint_id": uuid.uuid4(),
         "title": "New Chat"
     }
     st.session_state.input_mode = "initial"
     st.rerun()
 
+def delete_chat(chat_id):
+    """Forget a chat: its cached data namespace and its checkpoints are released at once."""
+    chat = st.session_state.chat_sessions.pop(chat_id)
+    state_manager.drop_namespace(chat["checkpoint_id"])
+    get_checkpointer().delete_thread(str(chat["checkpoint_id"]))
+    st.session_state.suggestions = []
+    if st.session_state.chat_sessions:
+        switch_to_chat(next(reversed(st.session_state.chat_sessions)))
+    else:
+        create_new_chat()
+
 def switch_to_chat(chat_id):
     st.session_state.current_chat_id = chat_id
     st.rerun()
@@ -50,22 +67,19 @@ def generate_chat_title(message):
     return message[:30] + "..." if len(message) > 30 else message
 
 async def get_streaming_response(prompt, checkpoint_id):
+    system_prompt = None
     if len(current_chat["messages"]) <= 1:
-        initial_state = {
-            "messages": [SystemMessage(content=f"You are a finance bot. Today is {str(datetime.datetime.now())}")]
-        }
-        config = {"configurable": {"thread_id": checkpoint_id}}
-        response = await graph.ainvoke(initial_state, config=config)
-
-    config = {"configurable": {"thread_id": checkpoint_id}}
-    async_generator = graph.astream_events({
-        "messages": [HumanMessage(content=prompt)],
-    }, config=config, version="v2")
-
-    events = []
+        # a new thread gets its system prompt in the same graph execution as the first prompt
+        system_prompt = f"You are a finance bot. Today is {datetime.date.today()}"
+
+    config = {"configurable": {"thread_id": str(checkpoint_id)}}
+    async_generator = graph.astream_events(
+        Graph.turn_input(prompt, system_prompt),
+        config=config, version="v2", include_types=STREAM_EVENT_TYPES, include_names=STREAM_EVENT_NAMES
+    )
+
     async for event in async_generator:
-        events.append(event)
-    return events
+        yield event
 
 def serialise_ai_message_chunk(chunk):
     if isinstance(chunk, AIMessageChunk):
@@ -74,12 +88,48 @@ def serialise_ai_message_chunk(chunk):
         raise TypeError(f"Object of type {type(chunk).__name__} is not AIMessageChunk")
 
 def stream_response(prompt, checkpoint_id):
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        return loop.run_until_complete(get_streaming_response(prompt, checkpoint_id))
-    finally:
-        loop.close()
+    """Yield graph events to the Streamlit script as soon as the graph produces them.
+
+    The graph runs on the process-wide background loop, so client connection
+    pools and caches are reused across turns and sessions.
+    """
+    yield from get_background_loop().stream(get_streaming_response(prompt, checkpoint_id))
+
+def dataframe_key(chat_id, message_index, df_index):
+    """Stable widget key, the same dataframe keeps its widget across reruns."""
+    return f"df_{chat_id}_{message_index}_{df_index}"
+
+def render_tool_result(name, args, output, dfs, message_index):
+    """Render the UI element for a finished tool call, returns False if its data is not cached yet."""
+    if name in ("data_fetch_tool", "batch_data_fetch_tool"):
+        key = dataframe_key(st.session_state.current_chat_id, message_index, len(dfs))
+        st.data_editor(output, use_container_width=True, key=key)
+        dfs.append(output)
+    elif name == "chart_tool":
+        checkpoint_id = st.session_state.chat_sessions[st.session_state.current_chat_id]["checkpoint_id"]
+        with state_manager.scope(checkpoint_id):
+            df = load_dataset(args["port"], args["report_date"])
+        if df is None:
+            return False
+        generate_chart(df, args['chart_type'])
+    elif name == "dashboard_tool":
+        st.session_state["dashboard_portfolio"] = args["port"]
+        st.session_state["view_dashboard"] = st.button(f"Dashboard {args['port']}")
+    elif name == "report_tool":
+        with open("report.pdf", "rb") as pdf_file:
+            PDFbyte = pdf_file.read()
+
+        st.download_button(label=f"Download Report for {args['port']}",
+            data=PDFbyte,
+            file_name=f"{args['port']}_report.pdf",
+            mime='application/octet-stream'
+        )
+    return True
+
+def tool_status_label(name, args, done=False):
+    if name == "tavily_search_results_json":
+        return "Search completed" if done else f"Searching for: {args.get('query', '')}"
+    return f"{name} completed" if done else f"Running {name}"
 
 def run_llm(prompt):
     current_chat = st.session_state.chat_sessions[st.session_state.current_chat_id]
@@ -91,72 +141,92 @@ def run_llm(prompt):
         current_chat["title"] = generate_chat_title(prompt)
 
     checkpoint_id = current_chat["checkpoint_id"]
+    # the answer is stored at this index, history reruns reuse its dataframe widget keys
+    message_index = len(current_chat["messages"])
     try:
         with st.chat_message("assistant"):
             full_response = ""
-            search_status = None
             response_container = st.empty()
-            events = stream_response(prompt, checkpoint_id)
+            statuses = {} # tool run id -> status widget
+            pending = [] # tool results whose data was still being fetched
             dfs = []
 
-            for event in events:
+            for event in stream_response(prompt, checkpoint_id):
                 event_type = event["event"]
+                # tokens of LLMs running inside tools (e.g. the pandas agent) are not part of the answer
+                from_model_node = event.get("metadata", {}).get("langgraph_node") == "model"
 
-                if event_type == "on_chat_model_stream":
+                if event_type == "on_chat_model_stream" and from_model_node:
                     chunk_content = serialise_ai_message_chunk(event["data"]["chunk"])
                     full_response += chunk_content
                     response_container.write(full_response)
 
-                elif event_type == "on_chat_model_end":
-                    tool_calls = event["data"]["output"].tool_calls if hasattr(event["data"]["output"], "tool_calls") else []
-                    for call in tool_calls:
-                        name = call["name"]
-                        args = call["args"]
-                        if name == "data_fetch_tool":
-                            df = state_manager.get(str(repr(args)))
-                            dfs.append(df)
-                            st.data_editor(df, use_container_width=True, key=uuid.uuid4())
-                        elif name == "chart_tool":
-                            df = state_manager.get(str(repr({
-                                "port": args["port"],
-                                "report_date": args["report_date"]
-                            })))
-                            generate_chart(df, args['chart_type'])
-                        elif name == "dashboard_tool":
-                            st.session_state["dashboard_portfolio"] = args["port"]
-                            st.session_state["view_dashboard"] = st.button(f"Dashboard {args['port']}")
-                        elif name == "report_tool":
-                            with open("report.pdf", "rb") as pdf_file:
-                                PDFbyte = pdf_file.read()
-
-                            st.download_button(label=f"Download Report for {args['port']}",
-                                data=PDFbyte,
-                                file_name=f"{args['port']}_report.pdf",
-                                mime='application/octet-stream'
-                            )
-
-                        elif name == "tavily_search_results_json":
-                            search_query = args.get("query", "")
-                            search_status = st.status(f"Searching for: {search_query}", expanded=True)
-                            search_status.update(label=f"Searching for: {search_query}", state="running")
-
-                elif event_type == "on_tool_end" and search_status:
-                    output = event["data"]["output"]
-                    if isinstance(output, list):
-                        search_status.update(label="Search completed", state="complete")
+                elif event_type == "on_custom_event" and event["name"] == "model_cache_hit":
+                    # cached model turns emit no model events, the whole answer arrives at once
+                    full_response += event["data"]["message"].content
+                    response_container.write(full_response)
+
+                elif event_type == "on_tool_start":
+                    if any(parent in statuses for parent in event.get("parent_ids", [])):
+                        continue # a tool called by one of our tools, e.g. the cached search
+                    args = event["data"].get("input") or {}
+                    statuses[event["run_id"]] = st.status(
+                        tool_status_label(event["name"], args), state="running",
+                        expanded=event["name"] == "tavily_search_results_json"
+                    )
+
+                elif event_type == "on_tool_end" and event["run_id"] in statuses:
+                    args = event["data"].get("input") or {}
+                    statuses[event["run_id"]].update(label=tool_status_label(event["name"], args, done=True), state="complete")
+                    if not render_tool_result(event["name"], args, event["data"]["output"], dfs, message_index):
+                        pending.append((event["name"], args, event["data"]["output"]))
+
+                elif event_type == "on_tool_error" and event["run_id"] in statuses:
+                    statuses[event["run_id"]].update(label=f"{event['name']} failed", state="error")
+
+            for name, args, output in pending:
+                render_tool_result(name, args, output, dfs, message_index)
 
             current_chat["messages"].append({
-                "role": "assistant", "content": full_response, "dataframes": dfs
+                "role": "assistant", "content": full_response, "tables": [to_arrow(df) for df in dfs]
             })
 
     except Exception as e:
         st.error("Something went wrong: " + str(e))
 
+def run_turn(prompt):
+    """Answer a prompt while its follow-up suggestions are generated alongside on the background loop."""
+    suggestions = get_background_loop().submit(asuggest_followups(prompt))
+    run_llm(prompt)
+    st.session_state.suggestions_for = prompt
+    try:
+        st.session_state.suggestions = suggestions.result(timeout=SUGGESTION_TIMEOUT)
+    except Exception:
+        suggestions.cancel()
+        st.session_state.suggestions = []
+
+def to_arrow(df):
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+def render_payload(message):
+    """Arrow tables of a message, converted once. History keeps only the tables, not the dataframes as well."""
+    if "tables" not in message:
+        message["tables"] = [to_arrow(df) for df in message.pop("dataframes", [])]
+    return message["tables"]
+
+def render_history_message(chat_id, index, message):
+    with st.chat_message(message["role"]):
+        st.write(message["content"])
+        for df_index, table in enumerate(render_payload(message)):
+            st.data_editor(table, use_container_width=True, key=dataframe_key(chat_id, index, df_index))
+
 # Sidebar
 with st.sidebar:
     st.title(APP_NAME)
     if st.button("➕", use_container_width=True):
         create_new_chat()
+    if st.button("🗑️ Delete chat", key="delete_chat", use_container_width=True):
+        delete_chat(st.session_state.current_chat_id)
     st.divider()
     st.subheader("Previous chats")
     for chat_id, chat_data in reversed(list(st.session_state.chat_sessions.items())):
@@ -176,42 +246,40 @@ if len(current_chat["messages"]) <= 1:
     st.write("Ask anything about your portfolio")
 
     def fetch_dynamic_starter_prompts():
-        return [
-            "Show me the performance data of SEL-AGG.",
-            "What are the risk metrics of this fund?",
-            "Can you explain the fund attribution?",
-            "Compare returns of two funds over 5 years.",
-            "How has this fund performed vs the benchmark?"
-        ]
+        return STARTER_PROMPTS
 
     if st.session_state.input_mode == "initial":
         st.write("💡 Try one of these to get started:")
         prompts = fetch_dynamic_starter_prompts()
         for i, prompt in enumerate(prompts):
             if st.button(prompt, key=f"starter_prompt_{i}"):
-                run_llm(prompt)
-                st.session_state.suggestions = suggest_followups(prompt)
+                run_turn(prompt)
                 st.session_state.input_mode = "chat"
                 st.rerun()
 
-for message in current_chat["messages"]:
-    with st.chat_message(message["role"]):
-        st.write(message["content"])
-        for df in message.get("dataframes", []):
-            st.data_editor(df, key=uuid.uuid4())
+# Chat history, only the last HISTORY_TURNS turns are rendered until earlier pages are requested
+history_pages = st.session_state.setdefault("history_pages", {})
+shown = 2 * HISTORY_TURNS * (1 + history_pages.get(st.session_state.current_chat_id, 0))
+first_shown = max(0, len(current_chat["messages"]) - shown)
+if first_shown > 0:
+    if st.button("Show earlier messages", key="history_more"):
+        history_pages[st.session_state.current_chat_id] = history_pages.get(st.session_state.current_chat_id, 0) + 1
+        st.rerun()
+
+for index in range(first_shown, len(current_chat["messages"])):
+    render_history_message(st.session_state.current_chat_id, index, current_chat["messages"][index])
 
 # Manual chat input
 if prompt := st.chat_input("Type your message here..."):
-    run_llm(prompt)
-    st.session_state.suggestions = suggest_followups(prompt)
+    run_turn(prompt)
 
 # Show follow-up suggestions
 if st.session_state.get("suggestions"):
     st.write("💬 Suggested follow-ups:")
     for i, q in enumerate(st.session_state.suggestions):
         if st.button(q, key=f"followup_{i}"):
-            run_llm(q)
-            st.session_state.suggestions = suggest_followups(q)
+            record_followup_click(st.session_state.get("suggestions_for", ""), q)
+            run_turn(q)
             st.rerun()
 
 # Optional dashboard UI
@@ -0,0 +1,397 @@
+import asyncio
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.types import TASKS
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+class SqliteCheckpointer(BaseCheckpointSaver):
+    """
+    Checkpointer storing LangGraph checkpoints in a local SQLite file.
+
+    Writes are buffered and flushed in one transaction once ``batch_size``
+    operations are pending, ``flush_interval`` seconds after the first pending
+    one (by a timer thread, so an idle process still writes them), before any
+    read and at exit. Only the last ``keep_last`` checkpoints of every thread are
+    kept. Nothing is held in memory between calls, so old threads are only read
+    from disk when they are resumed.
+    """
+
+    def __init__(self, path: str = "checkpoints.sqlite", keep_last: Optional[int] = 10,
+                 batch_size: int = 16, flush_interval: float = 2.0, serde=None):
+        """
+        Args:
+            path: SQLite database file, created if it does not exist
+            keep_last: Checkpoints kept per thread and namespace, None keeps all
+            batch_size: Pending write operations that trigger a flush
+            flush_interval: Seconds after which pending writes are flushed
+            serde: Serializer, defaults to LangGraph's JsonPlusSerializer
+        """
+        super().__init__(serde=serde)
+        self.path = path
+        self.keep_last = keep_last
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._pending_checkpoints: List[tuple] = []
+        self._pending_writes: List[Tuple[str, tuple]] = []
+        self._first_pending_at: Optional[float] = None
+        self._flush_timer: Optional[threading.Timer] = None
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        atexit.register(self.close)
+
+    # Write buffering
+
+    def _queue(self, checkpoints: Sequence[tuple] = (), writes: Sequence[Tuple[str, tuple]] = ()):
+        with self._lock:
+            self._pending_checkpoints.extend(checkpoints)
+            self._pending_writes.extend(writes)
+            if self._first_pending_at is None:
+                self._first_pending_at = time.monotonic()
+                self._flush_timer = threading.Timer(self.flush_interval, self._flush_on_timer)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+            pending = len(self._pending_checkpoints) + len(self._pending_writes)
+            if (pending >= self.batch_size
+                    or time.monotonic() - self._first_pending_at >= self.flush_interval):
+                self.flush()
+
+    def flush(self):
+        """Write all buffered checkpoints and writes in a single transaction."""
+        with self._lock:
+            if not self._pending_checkpoints and not self._pending_writes:
+                return
+            checkpoints, self._pending_checkpoints = self._pending_checkpoints, []
+            writes, self._pending_writes = self._pending_writes, []
+            self._first_pending_at = None
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)", checkpoints
+                )
+                for verb, row in writes:
+                    self._conn.execute(f"INSERT OR {verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+                for thread_id, checkpoint_ns in {(row[0], row[1]) for row in checkpoints}:
+                    self._prune(thread_id, checkpoint_ns)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _flush_on_timer(self):
+        with self._lock:
+            if self._conn is not None:
+                self.flush()
+
+    def _prune(self, thread_id: str, checkpoint_ns: str):
+        """Drop checkpoints (and their writes) older than the last ``keep_last``."""
+        if not self.keep_last:
+            return
+        row = self._conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.keep_last - 1),
+        ).fetchone()
+        if row is None:
+            return
+        for table in ("checkpoints", "writes"):
+            self._conn.execute(
+                f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                (thread_id, checkpoint_ns, row[0]),
+            )
+
+    def close(self):
+        """Flush pending writes and close the database."""
+        with self._lock:
+            if self._conn is None:
+                return
+            self.flush()
+            self._conn.close()
+            self._conn = None
+
+    # Reads
+
+    def _query(self, sql: str, params: Sequence[Any]) -> List[tuple]:
+        with self._lock:
+            self.flush()
+            return self._conn.execute(sql, params).fetchall()
+
+    def _load_tuple(self, thread_id: str, row: tuple) -> CheckpointTuple:
+        checkpoint_ns, checkpoint_id, parent_checkpoint_id, type_, checkpoint, metadata_type, metadata = row
+        writes = self._query(
+            "SELECT task_id, channel, type, value FROM writes WHERE thread_id = ? AND checkpoint_ns = ? "
+            "AND checkpoint_id = ? ORDER BY task_id, idx",
+            (str(thread_id), checkpoint_ns, checkpoint_id),
+        )
+        sends = []
+        if parent_checkpoint_id:
+            sends = self._query(
+                "SELECT type, value FROM writes WHERE thread_id = ? AND checkpoint_ns = ? "
+                "AND checkpoint_id = ? AND channel = ? ORDER BY task_path, task_id, idx",
+                (str(thread_id), checkpoint_ns, parent_checkpoint_id, TASKS),
+            )
+        checkpoint_: Checkpoint = self.serde.loads_typed((type_, checkpoint))
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={
+                **checkpoint_,
+                "pending_sends": [self.serde.loads_typed(send) for send in sends],
+            },
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Return the requested checkpoint, or the latest one of the thread."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+        if checkpoint_id := get_checkpoint_id(config):
+            rows = self._query(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (str(thread_id), checkpoint_ns, checkpoint_id),
+            )
+        else:
+            rows = self._query(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT 1",
+                (str(thread_id), checkpoint_ns),
+            )
+        if not rows:
+            return None
+        return self._load_tuple(thread_id, rows[0])
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """List checkpoints newest first, optionally filtered by thread, metadata and ``before``."""
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(str(config["configurable"]["thread_id"]))
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_checkpoint_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_checkpoint_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._query(
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+            f"metadata_type, metadata FROM checkpoints {where} ORDER BY checkpoint_id DESC",
+            params,
+        )
+        for thread_id, *row in rows:
+            if limit is not None and limit <= 0:
+                break
+            metadata = self.serde.loads_typed((row[5], row[6]))
+            if filter and not all(metadata.get(key) == value for key, value in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            if config:
+                thread_id = config["configurable"]["thread_id"]
+            yield self._load_tuple(thread_id, row)
+
+    # Writes
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Queue a checkpoint for writing and return its config."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        c = checkpoint.copy()
+        c.pop("pending_sends", None)  # rebuilt from the parent's writes on load
+        type_, serialized = self.serde.dumps_typed(c)
+        metadata_type, serialized_metadata = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        self._queue(checkpoints=[(
+            str(thread_id),
+            checkpoint_ns,
+            checkpoint["id"],
+            config["configurable"].get("checkpoint_id"),  # parent
+            type_,
+            serialized,
+            metadata_type,
+            serialized_metadata,
+        )])
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Queue the pending writes of a task."""
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            # special writes (errors, interrupts) replace earlier ones, regular writes are kept once
+            verb = "REPLACE" if write_idx < 0 else "IGNORE"
+            value_type, serialized = self.serde.dumps_typed(value)
+            rows.append((verb, (
+                thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx,
+                channel, value_type, serialized, task_path,
+            )))
+        self._queue(writes=rows)
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete all checkpoints and writes of a thread."""
+        with self._lock:
+            self.flush()
+            for table in ("checkpoints", "writes"):
+                self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (str(thread_id),))
+
+    # Async API, SQLite calls run on a worker thread to keep the event loop free
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def create_checkpointer(backend: Optional[str] = None) -> BaseCheckpointSaver:
+    """
+    Build the graph checkpointer selected by ``backend`` or the CHECKPOINT_BACKEND env var.
+
+    Supported backends are ``memory`` (process local, lost on restart) and
+    ``sqlite`` (durable, configured with CHECKPOINT_DB, CHECKPOINT_KEEP_LAST
+    and CHECKPOINT_BATCH_SIZE).
+    """
+    backend = (backend or os.getenv("CHECKPOINT_BACKEND", "memory")).lower()
+    if backend == "memory":
+        return MemorySaver()
+    if backend == "sqlite":
+        keep_last = int(os.getenv("CHECKPOINT_KEEP_LAST", "10"))
+        return SqliteCheckpointer(
+            path=os.getenv("CHECKPOINT_DB", "checkpoints.sqlite"),
+            keep_last=keep_last or None,
+            batch_size=int(os.getenv("CHECKPOINT_BATCH_SIZE", "16")),
+        )
+    raise ValueError(f"Unknown checkpoint backend {backend}")
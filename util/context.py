@@ -0,0 +1,68 @@
+from typing import List, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+
+def summarize_tool_message(message: ToolMessage, max_chars: int) -> ToolMessage:
+    """Replace a large tool result with a short head of its content."""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    if len(content) <= max_chars:
+        return message
+    summary = (
+        f"[{message.name} result compacted, {len(content)} chars] "
+        f"{content[:max_chars]}..."
+    )
+    return message.model_copy(update={"content": summary})
+
+
+def split_turns(messages: List[BaseMessage]) -> List[List[BaseMessage]]:
+    """Group messages into turns, each starting at a user message.
+
+    A model message and the ToolMessages answering its tool calls always end up
+    in the same turn, so dropping whole turns never leaves a dangling tool call.
+    """
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def compact_history(messages: List[BaseMessage], keep_turns: int = 6,
+                    max_tokens: Optional[int] = 24000, max_tool_chars: int = 500) -> List[BaseMessage]:
+    """
+    Bound the history sent to the model.
+
+    System messages and the last ``keep_turns`` turns are kept verbatim. In
+    older turns, tool results longer than ``max_tool_chars`` are collapsed into
+    a short summary. Oldest turns are then dropped until the estimated prompt
+    size fits ``max_tokens``; the latest turn is always kept.
+
+    Args:
+        messages: Full conversation from the graph state
+        keep_turns: Number of most recent turns kept verbatim
+        max_tokens: Approximate token budget, None for no limit
+        max_tool_chars: Characters kept from each compacted tool result
+    """
+    system = [message for message in messages if isinstance(message, SystemMessage)]
+    turns = split_turns([message for message in messages if not isinstance(message, SystemMessage)])
+
+    recent = turns[-keep_turns:] if keep_turns > 0 else turns[-1:]
+    older = [
+        [summarize_tool_message(message, max_tool_chars) if isinstance(message, ToolMessage) else message
+         for message in turn]
+        for turn in turns[:len(turns) - len(recent)]
+    ]
+    turns = older + recent
+
+    if max_tokens is not None:
+        budget = max_tokens - count_tokens_approximately(system)
+        sizes = [count_tokens_approximately(turn) for turn in turns]
+        total = sum(sizes)
+        while len(turns) > 1 and total > budget:
+            total -= sizes.pop(0)
+            turns.pop(0)
+
+    return system + [message for turn in turns for message in turn]
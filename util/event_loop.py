@@ -0,0 +1,84 @@
+import asyncio
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Coroutine, Iterator, Optional
+
+from .startup import singleton
+
+_ITEM, _ERROR, _DONE = range(3)
+
+
+class BackgroundLoop:
+    """
+    Long-lived asyncio event loop running on its own daemon thread.
+
+    Synchronous code (the Streamlit script) submits coroutines from any thread
+    and gets a concurrent Future back, or iterates over an async generator as
+    a plain iterator. Because the loop outlives script reruns, HTTP keep-alive
+    pools, loop-bound caches and background tasks survive across turns.
+    """
+
+    def __init__(self, name: str = "background-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro: Coroutine) -> Future:
+        """Schedule a coroutine on the loop, safe to call from any thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the loop and block until its result is available."""
+        return self.submit(coro).result(timeout)
+
+    def stream(self, agen: AsyncIterator, timeout: Optional[float] = None) -> Iterator:
+        """
+        Iterate over an async generator from synchronous code.
+
+        Items are handed over through a queue as the generator produces them.
+        If the caller stops iterating early (e.g. Streamlit interrupts the
+        script) the producing task is cancelled.
+
+        Args:
+            agen: Async generator to consume on the loop
+            timeout: Seconds to wait for each item, None waits forever
+        """
+        items: queue.Queue = queue.Queue()
+
+        async def pump():
+            try:
+                async for item in agen:
+                    items.put((_ITEM, item))
+            except BaseException as exp:
+                items.put((_ERROR, exp))
+                raise
+            else:
+                items.put((_DONE, None))
+
+        future = self.submit(pump())
+        try:
+            while True:
+                kind, value = items.get(timeout=timeout)
+                if kind == _DONE:
+                    return
+                if kind == _ERROR:
+                    raise value
+                yield value
+        finally:
+            if not future.done():
+                future.cancel()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+
+@singleton("background event loop")
+def get_background_loop() -> BackgroundLoop:
+    """Process-wide loop used to run the graph and other async work for every session."""
+    return BackgroundLoop()
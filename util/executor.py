@@ -0,0 +1,30 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Process-wide pool for blocking tool work (pandas, file IO), sized by TOOL_EXECUTOR_WORKERS."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int(os.getenv("TOOL_EXECUTOR_WORKERS", "0")) or min(32, (os.cpu_count() or 1) + 4)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tool-worker")
+        return _executor
+
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking function on the shared pool without stalling the event loop.
+
+    Context variables are copied into the worker thread, like asyncio.to_thread does.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    return await loop.run_in_executor(get_executor(), call)
@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+
+def _normalize_text(content) -> str:
+    if not isinstance(content, str):
+        content = json.dumps(content, sort_keys=True, default=str)
+    return re.sub(r"\s+", " ", content).strip()
+
+
+def normalize_message(message: BaseMessage) -> dict:
+    """Reduce a message to the parts that influence the model's answer.
+
+    Ids (message ids, tool call ids) differ on every run and are left out.
+    """
+    normalized = {"type": message.type, "content": _normalize_text(message.content)}
+    if getattr(message, "name", None):
+        normalized["name"] = message.name
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        normalized["tool_calls"] = [
+            {"name": call["name"], "args": call["args"]} for call in tool_calls
+        ]
+    return normalized
+
+
+def tools_fingerprint(tools: Iterable, model_name: str = "") -> str:
+    """Hash of the bound tool schemas (and model name) to salt response cache keys."""
+    schemas = [convert_to_openai_tool(tool) for tool in tools]
+    payload = json.dumps({"model": model_name, "tools": schemas}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two tier cache of model responses keyed on the normalized message history.
+
+    An in-memory LRU sits in front of an optional SQLite file shared by all
+    workers on the host. Entries expire after ``ttl`` seconds, expired rows
+    are deleted from the file every ``purge_every`` writes. Hit and miss
+    counters are available through ``stats()``.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 900, path: Optional[str] = None,
+                 purge_every: int = 100):
+        """
+        Args:
+            max_entries: Responses kept in the in-memory tier
+            ttl: Seconds a cached response stays valid
+            path: SQLite file for the on-disk tier, None for memory only
+            purge_every: Writes to the SQLite tier between two deletions of expired rows
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._disk_writes = 0
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()  # the SQLite tier, so disk I/O never holds up memory hits
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, expires_at REAL, value TEXT)"
+            )
+            self.purge()
+
+    @staticmethod
+    def key(messages: List[BaseMessage], salt: str = "") -> str:
+        """Cache key for a prompt, ``salt`` should identify the model and bound tools."""
+        payload = json.dumps([salt] + [normalize_message(message) for message in messages],
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _remember(self, key: str, expires_at: float, value: str):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _memory_get(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] > now:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return entry[1]
+            self._memory.pop(key, None)
+            if self._conn is None:
+                self._counters["misses"] += 1
+            return None
+
+    def _disk_get(self, key: str, now: float) -> Optional[str]:
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT expires_at, value FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        with self._lock:
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+            self._remember(key, row[0], row[1])
+            self._counters["disk_hits"] += 1
+            return row[1]
+
+    def _disk_set(self, key: str, expires_at: float, value: str):
+        with self._db_lock:
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", (key, expires_at, value))
+            self._disk_writes += 1
+            due = self._disk_writes % self.purge_every == 0
+        if due:
+            self.purge()
+
+    def purge(self) -> int:
+        """Delete the expired rows of the SQLite tier, returns how many were deleted."""
+        if self._conn is None:
+            return 0
+        with self._db_lock:
+            return self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def get(self, key: str) -> Optional[AIMessage]:
+        """Return a fresh copy of the cached response, or None."""
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is None and self._conn is not None:
+            value = self._disk_get(key, now)
+        return None if value is None else self._load(value)
+
+    async def aget(self, key: str) -> Optional[AIMessage]:
+        """Like get, the SQLite tier is read on a worker thread to keep the event loop free."""
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is None and self._conn is not None:
+            value = await asyncio.to_thread(self._disk_get, key, now)
+        return None if value is None else self._load(value)
+
+    def _prepare(self, key: str, message: AIMessage) -> tuple:
+        value = json.dumps(message_to_dict(message))
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, value)
+        return expires_at, value
+
+    def set(self, key: str, message: AIMessage):
+        """Cache a model response."""
+        expires_at, value = self._prepare(key, message)
+        if self._conn is not None:
+            self._disk_set(key, expires_at, value)
+
+    async def aset(self, key: str, message: AIMessage):
+        """Like set, the SQLite tier is written on a worker thread."""
+        expires_at, value = self._prepare(key, message)
+        if self._conn is not None:
+            await asyncio.to_thread(self._disk_set, key, expires_at, value)
+
+    @staticmethod
+    def _load(value: str) -> AIMessage:
+        """Rebuild a cached response with fresh message and tool call ids.
+
+        Reusing ids would make add_messages replace an earlier identical
+        answer in the same thread instead of appending.
+        """
+        message = messages_from_dict([json.loads(value)])[0]
+        tool_calls = [{**call, "id": f"call_{uuid.uuid4().hex[:24]}"} for call in message.tool_calls]
+        additional_kwargs = {k: v for k, v in message.additional_kwargs.items() if k != "tool_calls"}
+        return message.model_copy(update={
+            "id": None, "tool_calls": tool_calls, "additional_kwargs": additional_kwargs
+        })
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the overall hit rate."""
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = sum(counters.values())
+        counters["hit_rate"] = (counters["memory_hits"] + counters["disk_hits"]) / lookups if lookups else 0.0
+        return counters
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._conn is not None:
+            with self._db_lock:
+                self._conn.execute("DELETE FROM responses")
@@ -0,0 +1,42 @@
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of at most ``size`` connections, opened on demand.
+
+    Connections are handed out with ``with pool.connection() as conn:`` and
+    reused by the next caller instead of being opened for every query.
+    """
+
+    def __init__(self, connect: Callable[[], Any], size: int = 4):
+        """
+        Args:
+            connect: Opens a new connection
+            size: Maximum number of connections open at once, callers wait for a free one
+        """
+        self._connect = connect
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            finally:
+                self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
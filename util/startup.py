@@ -0,0 +1,55 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+_timings: List[Tuple[float, int, str, float]] = []  # (start, depth, step, seconds)
+_local = threading.local()
+
+
+@contextmanager
+def timed(step: str):
+    """Record how long a startup step (an import or a construction) takes."""
+    depth = getattr(_local, "depth", 0)
+    _local.depth = depth + 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _local.depth = depth
+        _timings.append((start, depth, step, time.perf_counter() - start))
+
+
+def singleton(step: str) -> Callable[[Callable[[], T]], Callable[[], T]]:
+    """
+    Turn a zero-argument factory into a lazy, process-wide singleton getter.
+
+    The factory runs once, on first use, and its duration is recorded under
+    ``step`` for the startup report.
+    """
+    def decorator(factory: Callable[[], T]) -> Callable[[], T]:
+        lock = threading.Lock()
+        instance: List[T] = []
+
+        @functools.wraps(factory)
+        def get() -> T:
+            if not instance:
+                with lock:
+                    if not instance:
+                        with timed(step):
+                            instance.append(factory())
+            return instance[0]
+
+        return get
+    return decorator
+
+
+def startup_report() -> str:
+    """Format the recorded steps, nested steps are indented under their parent."""
+    lines = []
+    for _, depth, step, seconds in sorted(_timings):
+        lines.append(f"{seconds * 1000:10.1f} ms  {'  ' * depth}{step}")
+    return "\n".join(lines)
@@ -0,0 +1,576 @@
+import itertools
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+_MISSING = object()
+_atomic_lock = threading.RLock()  # compare_and_set / get_or_compute of backends without their own
+
+
+class StateBackend:
+    """
+    Storage behind the StateManager get/set/pop API.
+
+    ``shared`` backends are visible to every worker process using the same
+    store, so a dataframe fetched in one worker can be charted in another.
+    Shared backends pickle values and store keys as strings.
+    """
+
+    shared = False
+
+    def get(self, key, default=None) -> Any:
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def setdefault(self, key, default=None) -> Any:
+        raise NotImplementedError
+
+    def peek(self, key, default=None) -> Any:
+        """Like get, but without touching recency or hit counters."""
+        return self.get(key, default)
+
+    def pop(self, key, default=None) -> Any:
+        raise NotImplementedError
+
+    def contains(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def keys(self) -> List:
+        raise NotImplementedError
+
+    def items(self) -> List[Tuple[Any, Any]]:
+        items = []
+        for key in self.keys():
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                items.append((key, value))
+        return items
+
+    def update(self, values: dict):
+        for key, value in values.items():
+            self.set(key, value)
+
+    def clear(self):
+        raise NotImplementedError
+
+    def iter_keys(self) -> Iterator:
+        return iter(self.keys())
+
+    def iter_items(self) -> Iterator[Tuple[Any, Any]]:
+        for key in self.iter_keys():
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                yield key, value
+
+    def compare_and_set(self, key, expected, value) -> bool:
+        """
+        Set ``key`` to ``value`` only if it currently holds ``expected`` (compared
+        by identity, ``_MISSING`` for an absent key). Shared backends are only
+        atomic within one process.
+        """
+        with _atomic_lock:
+            if self.peek(key, _MISSING) is not expected:
+                return False
+            self.set(key, value)
+            return True
+
+    def get_or_compute(self, key, factory: Callable[[], Any]) -> Any:
+        """Return the value of ``key``, computing and storing it with ``factory`` if it is absent."""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        with _atomic_lock:
+            value = self.peek(key, _MISSING)
+            if value is _MISSING:
+                value = factory()
+                self.set(key, value)
+            return value
+
+    def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({len(self.keys())} keys)"
+
+
+def sizeof(value) -> int:
+    """Approximate memory held by a value, deep for pandas objects."""
+    memory_usage = getattr(value, "memory_usage", None)
+    if memory_usage is not None:
+        try:
+            usage = memory_usage(deep=True)
+            return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+        except TypeError:
+            pass
+    return sys.getsizeof(value)
+
+
+class _Stripe:
+    """One lock-protected shard of MemoryBackend with its own LRU order and counters."""
+
+    __slots__ = ("lock", "state", "counters", "computing")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> (value, size, expires_at, last used tick), least recently used first
+        self.state: "OrderedDict[Any, Tuple[Any, int, Optional[float], int]]" = OrderedDict()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        self.computing: Dict[Any, threading.Lock] = {}  # keys being built by get_or_compute
+
+
+class MemoryBackend(StateBackend):
+    """
+    Process-local dict, the original StateManager behaviour.
+
+    Keys are spread over ``stripes`` shards by hash, each with its own lock,
+    so threads working on different keys do not contend. Without limits,
+    reads take no lock at all.
+
+    With ``max_entries``, ``max_bytes`` or ``ttl`` set it becomes a bounded
+    cache: entries expire ``ttl`` seconds after they were set, and once
+    either limit is exceeded the least recently used entries of the whole
+    backend are evicted. The totals are shared by all shards and every entry
+    records when it was last used, so the oldest entry is the oldest of the
+    shards' LRU heads. The entry just set is never evicted to make room for
+    itself. Eviction listeners are called with ``(key, value, reason)``,
+    reason being ``"expired"``, ``"entries"`` or ``"bytes"``, outside the locks.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 ttl: Optional[float] = None, on_evict: Optional[Callable[[Any, Any, str], None]] = None,
+                 stripes: int = 16):
+        """
+        Args:
+            max_entries: Entries kept, None for no limit
+            max_bytes: Approximate bytes kept (see sizeof), None for no limit
+            ttl: Seconds an entry stays valid after it was set, None for no expiry
+            on_evict: Eviction listener, more can be added with add_eviction_listener
+            stripes: Number of shards, the limits apply to all of them together
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._stripes = [_Stripe() for _ in range(max(1, stripes))]
+        self._totals_lock = threading.Lock()  # taken inside a stripe lock, never the other way round
+        self._entries = 0
+        self._bytes = 0
+        self._ticks = itertools.count()  # recency across shards, next() is atomic
+        self._unbounded = max_entries is None and max_bytes is None and ttl is None
+        self._listeners: List[Callable[[Any, Any, str], None]] = [on_evict] if on_evict else []
+
+    def _stripe(self, key) -> _Stripe:
+        return self._stripes[hash(key) % len(self._stripes)]
+
+    def add_eviction_listener(self, listener: Callable[[Any, Any, str], None]):
+        self._listeners = self._listeners + [listener]  # copy on write, _notify reads without a lock
+
+    # Internal helpers, called with the stripe lock held. Dropped entries are
+    # collected in ``evicted`` so listeners can be notified once it is released.
+
+    def _count(self, entries: int, size: int):
+        with self._totals_lock:
+            self._entries += entries
+            self._bytes += size
+
+    def _drop(self, stripe: _Stripe, key, reason: str, evicted: list):
+        value, size, _, _ = stripe.state.pop(key)
+        self._count(-1, -size)
+        stripe.counters["expirations" if reason == "expired" else "evictions"] += 1
+        evicted.append((key, value, reason))
+
+    def _touch(self, stripe: _Stripe, key):
+        value, size, expires_at, _ = stripe.state[key]
+        stripe.state[key] = (value, size, expires_at, next(self._ticks))
+        stripe.state.move_to_end(key)
+
+    def _live(self, stripe: _Stripe, key, evicted: list) -> bool:
+        entry = stripe.state.get(key)
+        if entry is None:
+            return False
+        if entry[2] is not None and entry[2] <= time.monotonic():
+            self._drop(stripe, key, "expired", evicted)
+            return False
+        return True
+
+    def _purge_expired(self, stripe: _Stripe, evicted: list):
+        if self.ttl is None:
+            return
+        now = time.monotonic()
+        for key in [key for key, (_, _, expires_at, _) in stripe.state.items() if expires_at <= now]:
+            self._drop(stripe, key, "expired", evicted)
+
+    def _put(self, stripe: _Stripe, key, value, evicted: list):
+        size = sizeof(value) if self.max_bytes is not None else 0
+        previous = stripe.state.pop(key, None)
+        if previous is not None:
+            self._count(-1, -previous[1])
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        stripe.state[key] = (value, size, expires_at, next(self._ticks))
+        self._count(1, size)
+        self._purge_expired(stripe, evicted)
+
+    def _over_limit(self) -> Optional[str]:
+        if self.max_entries is not None and self._entries > self.max_entries:
+            return "entries"
+        if self.max_bytes is not None and self._bytes > self.max_bytes:
+            return "bytes"
+        return None
+
+    def _enforce_limits(self, keep, evicted: list):
+        """
+        Evict least recently used entries of any shard until both limits hold,
+        ``keep`` (the key just set) excepted. Called without any stripe lock
+        held, one shard is locked at a time.
+        """
+        while (reason := self._over_limit()) is not None:
+            oldest = None  # (tick, stripe, key)
+            for stripe in self._stripes:
+                with stripe.lock:
+                    for key, (_, _, _, tick) in stripe.state.items():
+                        if key != keep:
+                            if oldest is None or tick < oldest[0]:
+                                oldest = (tick, stripe, key)
+                            break  # the first other key is this shard's least recently used
+            if oldest is None:
+                return  # only the new entry is left, it stays even if it is over the limit alone
+            tick, stripe, key = oldest
+            with stripe.lock:
+                entry = stripe.state.get(key)
+                if entry is not None and entry[3] == tick:  # not used meanwhile
+                    self._drop(stripe, key, reason, evicted)
+
+    def _notify(self, evicted: list):
+        for key, value, reason in evicted:
+            for listener in self._listeners:
+                listener(key, value, reason)
+
+    def get(self, key, default=None):
+        stripe = self._stripe(key)
+        if self._unbounded:
+            # dict reads are atomic, no lock and no LRU bookkeeping needed
+            entry = stripe.state.get(key)
+            stripe.counters["hits" if entry is not None else "misses"] += 1  # approximate without the lock
+            return default if entry is None else entry[0]
+        evicted = []
+        with stripe.lock:
+            if self._live(stripe, key, evicted):
+                self._touch(stripe, key)
+                stripe.counters["hits"] += 1
+                value = stripe.state[key][0]
+            else:
+                stripe.counters["misses"] += 1
+                value = default
+        self._notify(evicted)
+        return value
+
+    def peek(self, key, default=None):
+        entry = self._stripe(key).state.get(key)
+        return default if entry is None else entry[0]
+
+    def set(self, key, value):
+        stripe = self._stripe(key)
+        evicted = []
+        with stripe.lock:
+            self._put(stripe, key, value, evicted)
+        self._enforce_limits(key, evicted)
+        self._notify(evicted)
+
+    def setdefault(self, key, default=None):
+        stripe = self._stripe(key)
+        evicted = []
+        with stripe.lock:
+            if self._live(stripe, key, evicted):
+                self._touch(stripe, key)
+                value = stripe.state[key][0]
+            else:
+                self._put(stripe, key, default, evicted)
+                value = default
+        self._enforce_limits(key, evicted)
+        self._notify(evicted)
+        return value
+
+    def compare_and_set(self, key, expected, value) -> bool:
+        stripe = self._stripe(key)
+        evicted = []
+        with stripe.lock:
+            current = stripe.state[key][0] if self._live(stripe, key, evicted) else _MISSING
+            swapped = current is expected
+            if swapped:
+                self._put(stripe, key, value, evicted)
+        if swapped:
+            self._enforce_limits(key, evicted)
+        self._notify(evicted)
+        return swapped
+
+    def get_or_compute(self, key, factory: Callable[[], Any]) -> Any:
+        """
+        Return the value of ``key``, or build it once with ``factory``.
+
+        Concurrent callers for the same key wait for the first one instead of
+        computing it again; the shard stays available to other keys meanwhile.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        stripe = self._stripe(key)
+        with stripe.lock:
+            key_lock = stripe.computing.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                value = self.get(key, _MISSING)
+                if value is _MISSING:
+                    value = factory()
+                    self.set(key, value)
+                return value
+        finally:
+            with stripe.lock:
+                if stripe.computing.get(key) is key_lock:
+                    del stripe.computing[key]
+
+    def pop(self, key, default=None):
+        stripe = self._stripe(key)
+        evicted = []
+        with stripe.lock:
+            if self._live(stripe, key, evicted):
+                value, size, _, _ = stripe.state.pop(key)
+                self._count(-1, -size)
+            else:
+                value = default
+        self._notify(evicted)
+        return value
+
+    def contains(self, key):
+        stripe = self._stripe(key)
+        if self._unbounded:
+            return key in stripe.state
+        evicted = []
+        with stripe.lock:
+            live = self._live(stripe, key, evicted)
+        self._notify(evicted)
+        return live
+
+    def iter_items(self) -> Iterator[Tuple[Any, Any]]:
+        """
+        Weakly consistent iteration: one shard is snapshotted at a time, so
+        no lock is held while the caller consumes the items and only one
+        shard's worth of entries is copied.
+        """
+        now = time.monotonic()
+        for stripe in self._stripes:
+            with stripe.lock:
+                snapshot = list(stripe.state.items())
+            for key, (value, _, expires_at, _) in snapshot:
+                if expires_at is None or expires_at > now:
+                    yield key, value
+
+    def iter_keys(self) -> Iterator:
+        for key, _ in self.iter_items():
+            yield key
+
+    def keys(self):
+        return list(self.iter_keys())
+
+    def items(self):
+        return list(self.iter_items())
+
+    def update(self, values):
+        for key, value in values.items():
+            self.set(key, value)
+
+    def clear(self):
+        for stripe in self._stripes:
+            with stripe.lock:
+                self._count(-len(stripe.state), -sum(size for _, size, _, _ in stripe.state.values()))
+                stripe.state.clear()
+
+    def stats(self) -> dict:
+        """Hit, miss, eviction and expiration counters plus the current size, summed over shards."""
+        totals = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        for stripe in self._stripes:
+            with stripe.lock:
+                for name, count in stripe.counters.items():
+                    totals[name] += count
+        with self._totals_lock:
+            entries, size = self._entries, self._bytes
+        lookups = totals["hits"] + totals["misses"]
+        return {
+            **totals,
+            "hit_rate": totals["hits"] / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size if self.max_bytes is not None else None,
+        }
+
+    def __repr__(self):
+        return f"MemoryBackend({dict(self.iter_items())})"
+
+
+class SqliteBackend(StateBackend):
+    """
+    Pickled values in a local SQLite file, shared by every worker on the host.
+
+    The database runs in WAL mode so readers in other processes are not
+    blocked by a writer.
+    """
+
+    shared = True
+
+    def __init__(self, path: str = "state.sqlite"):
+        """
+        Args:
+            path: SQLite database file, created if it does not exist
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value BLOB)")
+
+    def get(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM state WHERE key = ?", (str(key),)).fetchone()
+        return default if row is None else pickle.loads(row[0])
+
+    def set(self, key, value):
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (str(key), blob))
+
+    def setdefault(self, key, default=None):
+        blob = pickle.dumps(default, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO state VALUES (?, ?)", (str(key), blob))
+        return self.get(key, default)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("DELETE FROM state WHERE key = ? RETURNING value", (str(key),)).fetchone()
+        return default if row is None else pickle.loads(row[0])
+
+    def contains(self, key):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM state WHERE key = ?", (str(key),)).fetchone() is not None
+
+    def keys(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT key FROM state")]
+
+    def items(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT key, value FROM state").fetchall()
+        return [(key, pickle.loads(blob)) for key, blob in rows]
+
+    def update(self, values):
+        rows = [(str(key), pickle.dumps(value, pickle.HIGHEST_PROTOCOL)) for key, value in values.items()]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany("INSERT OR REPLACE INTO state VALUES (?, ?)", rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM state")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RedisBackend(StateBackend):
+    """
+    Pickled values in a Redis-protocol store shared by every worker.
+
+    ``client`` only needs the redis-py methods get, set, getdel, delete,
+    exists and scan_iter, so any compatible stand-in can replace a server.
+    """
+
+    shared = True
+
+    def __init__(self, client, prefix: str = "state:"):
+        """
+        Args:
+            client: redis.Redis instance or a compatible object
+            prefix: Namespace for the keys written by this backend
+        """
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str = "state:") -> "RedisBackend":
+        import redis  # optional dependency, only needed for STATE_BACKEND=redis
+
+        return cls(redis.Redis.from_url(url), prefix=prefix)
+
+    def _key(self, key) -> str:
+        return f"{self.prefix}{key}"
+
+    def _iter_keys(self) -> Iterator[str]:
+        for raw in self.client.scan_iter(match=f"{self.prefix}*"):
+            raw = raw.decode() if isinstance(raw, bytes) else raw
+            yield raw[len(self.prefix):]
+
+    def get(self, key, default=None):
+        blob = self.client.get(self._key(key))
+        return default if blob is None else pickle.loads(blob)
+
+    def set(self, key, value):
+        self.client.set(self._key(key), pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    def setdefault(self, key, default=None):
+        self.client.set(self._key(key), pickle.dumps(default, pickle.HIGHEST_PROTOCOL), nx=True)
+        return self.get(key, default)
+
+    def pop(self, key, default=None):
+        blob = self.client.getdel(self._key(key))
+        return default if blob is None else pickle.loads(blob)
+
+    def contains(self, key):
+        return bool(self.client.exists(self._key(key)))
+
+    def keys(self):
+        return list(self._iter_keys())
+
+    def clear(self):
+        keys = [self._key(key) for key in self._iter_keys()]
+        if keys:
+            self.client.delete(*keys)
+
+
+def create_state_backend(backend: Optional[str] = None) -> StateBackend:
+    """
+    Build the StateManager backend selected by ``backend`` or the STATE_BACKEND env var.
+
+    Supported backends are ``memory`` (process local, bounded by
+    STATE_MAX_ENTRIES, STATE_MAX_BYTES and STATE_TTL), ``sqlite`` (shared by
+    the workers on one host, configured with STATE_DB) and ``redis`` (shared
+    across hosts, configured with STATE_REDIS_URL and STATE_REDIS_PREFIX).
+    """
+    backend = (backend or os.getenv("STATE_BACKEND", "memory")).lower()
+    if backend == "memory":
+        return MemoryBackend(
+            max_entries=int(os.getenv("STATE_MAX_ENTRIES", "0")) or None,
+            max_bytes=int(os.getenv("STATE_MAX_BYTES", "0")) or None,
+            ttl=float(os.getenv("STATE_TTL", "0")) or None,
+        )
+    if backend == "sqlite":
+        return SqliteBackend(path=os.getenv("STATE_DB", "state.sqlite"))
+    if backend == "redis":
+        return RedisBackend.from_url(
+            os.getenv("STATE_REDIS_URL", "redis://localhost:6379/0"),
+            prefix=os.getenv("STATE_REDIS_PREFIX", "state:"),
+        )
+    raise ValueError(f"Unknown state backend {backend}")
@@ -3,46 +3,210 @@ import pickle
 import os
 import time
 import atexit
+import warnings
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
 from typing import Any, Dict, Optional, Iterable, Set
+from .state_backends import _MISSING, StateBackend, create_state_backend
+from .state_store import KeyFileStore
+
+_CHANGE_STRIPES = 16
+
+
+class _Changes:
+    """Keys set and removed since the last save, for the keys hashing to one stripe."""
+
+    __slots__ = ("lock", "dirty", "deleted")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.dirty = set()
+        self.deleted = set()
+
+
+_namespace: ContextVar[Optional[str]] = ContextVar("state_namespace", default=None)
+_NAMESPACE_PREFIX = "thread:"  # backend keys of namespaced values are "thread:<thread id>:<key>"
+
+
+@dataclass(frozen=True)
+class _Link:
+    """Held by a global key instead of a second copy of a value set in a namespace."""
+
+    target: str  # backend key of the namespaced value
 
 
 class StateManager:
+    """
+    Process-wide key/value state shared by the tools and the UI.
+
+    Values live in a pluggable backend chosen by STATE_BACKEND: ``memory``
+    (process local), ``sqlite`` or ``redis`` (shared by several workers).
+    The memory backend can be persisted to ``_persist_dir``: only keys changed
+    since the last save are written, and saved keys are read back lazily, the
+    first time they are used after a restart.
+
+    Inside ``scope(thread_id)`` get/set/pop/contains work on that chat
+    thread's namespace: values set there are stored once, in the backend
+    under a key prefixed with the thread id, and the global key gets a link
+    to it. Reads fall back to the global tier and follow links, so identical
+    fetches are shared while threads never overwrite each other's data.
+    Namespaced values are evicted, expired, saved and shared between workers
+    like any other key; a link to a value that is gone reads as missing.
+    Each namespace keeps an index of its keys, so ``drop_namespace`` deletes
+    exactly that thread's values (and the links to them), and only the last
+    STATE_MAX_NAMESPACES used namespaces are kept.
+    """
     _instance = None
     _lock = threading.RLock()
-    _persist_file = "utils/state_manager/app_state.pickle"
+    _persist_lock = threading.Lock()
+    _persist_dir = "util/state_manager"
+    _legacy_file = None  # single pickle saved by older versions, app_state.pickle in _persist_dir by default
     _auto_persist = False
     _persist_interval = 30  # seconds
     _persistence_thread = None
+    _max_namespaces = int(os.getenv("STATE_MAX_NAMESPACES", "256")) or None
     
     def __new__(cls):
         with cls._lock:
             if cls._instance is None:
                 cls._instance = super(StateManager, cls).__new__(cls)
-                cls._instance._state = {}
+                cls._instance._backend = create_state_backend()
+                cls._instance._store = None
+                cls._instance._unloaded = set()  # saved keys not read back yet
+                cls._instance._changes = [_Changes() for _ in range(_CHANGE_STRIPES)]  # striped, so writers do not contend
+                # thread id -> {backend key: global key} of its values, least recently used first
+                cls._instance._namespaces = OrderedDict()
+                cls._instance._namespace_lock = threading.Lock()
                 cls._instance._initialize()
         return cls._instance
 
     def _initialize(self):
         # Try to load persisted state if it exists
         self._try_load_state()
+        self._watch_evictions()
         
         # Register cleanup function to be called on exit
         atexit.register(self._cleanup)
     
+    @property
+    def backend(self) -> StateBackend:
+        return self._backend
+
+    def use_backend(self, backend: StateBackend):
+        """Swap the storage backend, e.g. for a shared store or a test stand-in. Existing values are not copied."""
+        with self._lock:
+            self._backend = backend
+            self._watch_evictions()
+
+    def stats(self) -> dict:
+        """Backend counters, e.g. hits, misses and evictions of the bounded memory backend."""
+        return {**self._backend.stats(), "namespaces": len(self._namespaces)}
+
+    @contextmanager
+    def scope(self, namespace):
+        """Run the block in the namespace of a chat thread, None for the global tier only."""
+        name = None if namespace is None else str(namespace)
+        if name is not None:
+            self._enter_namespace(name)
+        token = _namespace.set(name)
+        try:
+            yield
+        finally:
+            _namespace.reset(token)
+
+    def _enter_namespace(self, name: str):
+        """Mark a namespace as recently used and drop the least recently used ones over the limit."""
+        with self._namespace_lock:
+            self._namespaces.setdefault(name, {})
+            self._namespaces.move_to_end(name)
+            stale = []
+            while self._max_namespaces is not None and len(self._namespaces) > self._max_namespaces:
+                stale.append(self._namespaces.popitem(last=False)[1])
+        for index in stale:
+            self._release(index)
+
+    @staticmethod
+    def _scoped_key(key) -> Optional[str]:
+        """Backend key of ``key`` in the current namespace, None outside a scope."""
+        name = _namespace.get()
+        return None if name is None else f"{_NAMESPACE_PREFIX}{name}:{key}"
+
+    def _index(self, scoped: str, key):
+        # no lock: dict updates are atomic, and a namespace dropped meanwhile is simply recreated
+        name = _namespace.get()
+        index = self._namespaces.get(name)
+        if index is None:
+            index = self._namespaces.setdefault(name, {})
+        index[scoped] = key
+
+    def _unlink(self, scoped: str, key):
+        """Remove the global link to a namespaced value, unless another thread has replaced it."""
+        link = self._backend.peek(key, None)
+        if isinstance(link, _Link) and link.target == scoped:
+            self._backend.pop(key, None)
+            self._mark_deleted(key)
+
+    def drop_namespace(self, namespace) -> int:
+        """Release everything a chat thread holds in one call, returns the number of keys it had."""
+        with self._namespace_lock:
+            index = self._namespaces.pop(str(namespace), {})
+        return self._release(index)
+
+    def _release(self, index: dict) -> int:
+        for scoped, key in list(index.items()):
+            self._backend.pop(scoped, None)
+            self._mark_deleted(scoped)
+            if key is not None:  # None for keys saved before a restart, their links read as missing
+                self._unlink(scoped, key)
+        return len(index)
+
+    def add_eviction_listener(self, listener):
+        """Call ``listener(key, value, reason)`` when the backend evicts an entry."""
+        self._backend.add_eviction_listener(listener)
+
+    def _watch_evictions(self):
+        if hasattr(self._backend, "add_eviction_listener"):
+            self._backend.add_eviction_listener(self._on_evict)
+
+    def _on_evict(self, key, value, reason):
+        """Expired keys are deleted from disk, keys evicted for space are read back from disk when used again."""
+        changes = self._changes_of(key)
+        with changes.lock:
+            if reason == "expired" or key in changes.dirty:
+                changes.dirty.discard(key)
+                changes.deleted.add(key)
+            elif self._store is not None and key not in changes.deleted:
+                self._unloaded.add(key)
+
     def enable_persistence(self, auto_persist: bool = True, 
-                          persist_file: Optional[str] = None,
-                          persist_interval: int = 30):
+                          persist_dir: Optional[str] = None,
+                          persist_interval: int = 30,
+                          persist_file: Optional[str] = None):
         """
         Enable persistence of state to disk.
         
         Args:
             auto_persist: If True, state is automatically saved periodically
-            persist_file: Custom file path to save the state
+            persist_dir: Custom folder to save the state in
             persist_interval: Interval in seconds between auto-saves
+            persist_file: Deprecated, use persist_dir. The state is saved in a folder named
+                after the file (without extension) and the file itself is migrated once
         """
+        if persist_file:
+            warnings.warn(
+                "enable_persistence(persist_file=...) is deprecated, use persist_dir=...",
+                DeprecationWarning, stacklevel=2
+            )
+            persist_dir = persist_dir or os.path.splitext(persist_file)[0]
         with self._lock:
             if persist_file:
-                self._persist_file = persist_file
+                self._legacy_file = persist_file
+            if persist_dir and persist_dir != self._persist_dir:
+                self._persist_dir = persist_dir
+                self._store = None
+                self._try_load_state()
             
             self._auto_persist = auto_persist
             self._persist_interval = persist_interval
@@ -61,26 +225,104 @@ class StateManager:
             time.sleep(self._persist_interval)
             self.persist()
     
+    def _get_store(self) -> KeyFileStore:
+        if self._store is None:
+            self._store = KeyFileStore(self._persist_dir)
+        return self._store
+
     def _try_load_state(self):
-        """Try to load state from disk if it exists."""
-        if os.path.exists(self._persist_file):
-            try:
-                with open(self._persist_file, 'rb') as f:
+        """Read the index of saved keys, values are only loaded when first used."""
+        if self._backend.shared:
+            return  # shared backends keep their own state
+        try:
+            if os.path.exists(os.path.join(self._persist_dir, "index.log")):
+                self._unloaded = set(self._get_store().keys()) - set(self._backend.keys())
+                for key in self._unloaded:
+                    if isinstance(key, str) and key.startswith(_NAMESPACE_PREFIX):
+                        name = key[len(_NAMESPACE_PREFIX):].partition(":")[0]
+                        self._namespaces.setdefault(name, {})[key] = None
+            elif os.path.exists(legacy := self._legacy_file or os.path.join(self._persist_dir, "app_state.pickle")):
+                # state saved by older versions as a single pickle, rewritten per key on the next save
+                with open(legacy, 'rb') as f:
                     loaded_state = pickle.load(f)
-                    if isinstance(loaded_state, dict):
-                        self._state = loaded_state
-            except (pickle.PickleError, EOFError, IOError) as e:
-                print(f"Error loading persisted state: {e}")
+                if isinstance(loaded_state, dict):
+                    self._backend.update(loaded_state)
+                    for key in loaded_state:
+                        self._mark_set(key)
+        except (pickle.PickleError, EOFError, IOError) as e:
+            print(f"Error loading persisted state: {e}")
+
+    def _load(self, key):
+        """Read a saved key back into the backend, returns _MISSING if it was never saved."""
+        if key not in self._unloaded:
+            return _MISSING
+        try:
+            # concurrent readers of the same key share one disk read, other keys are not blocked
+            value = self._backend.get_or_compute(key, lambda: self._store.load(key))
+        except (KeyError, pickle.PickleError, EOFError, IOError) as e:
+            print(f"Error loading persisted state for {key!r}: {e}")
+            value = _MISSING
+        self._unloaded.discard(key)
+        return value
+
+    def _load_all(self):
+        for key in list(self._unloaded):
+            self._load(key)
+
+    # Each stripe of change sets is swapped by persist() under its lock, so it is only updated under it too.
+    # Shared backends keep their own state and are never saved, their changes are not tracked.
+
+    def _changes_of(self, key) -> _Changes:
+        return self._changes[hash(key) % len(self._changes)]
+
+    def _mark_set(self, key):
+        if self._backend.shared:
+            return
+        changes = self._changes_of(key)
+        with changes.lock:
+            self._unloaded.discard(key)
+            changes.deleted.discard(key)
+            changes.dirty.add(key)
+
+    def _mark_deleted(self, key):
+        if self._backend.shared:
+            return
+        changes = self._changes_of(key)
+        with changes.lock:
+            self._unloaded.discard(key)
+            changes.dirty.discard(key)
+            changes.deleted.add(key)
     
     def persist(self):
-        """Save state to disk."""
-        with self._lock:
+        """
+        Save the keys changed since the last save.
+
+        Each stripe of change sets is only locked while it is swapped for an
+        empty one, values are serialized and written without blocking
+        readers and writers.
+        """
+        if self._backend.shared:
+            return True
+        with self._persist_lock:
+            dirty, deleted = set(), set()
+            for changes in self._changes:
+                with changes.lock:
+                    dirty |= changes.dirty
+                    deleted |= changes.deleted
+                    changes.dirty, changes.deleted = set(), set()
+            changed = [(key, value) for key in dirty
+                       if (value := self._backend.peek(key, _MISSING)) is not _MISSING]
             try:
-                with open(self._persist_file, 'wb') as f:
-                    pickle.dump(self._state, f)
+                self._get_store().save(changed, deleted)
                 return True
             except (pickle.PickleError, IOError) as e:
                 print(f"Error persisting state: {e}")
+                for key in dirty | deleted:
+                    changes = self._changes_of(key)
+                    with changes.lock:
+                        # retry on the next save, unless the key changed state meanwhile
+                        if key not in changes.dirty and key not in changes.deleted:
+                            (changes.dirty if key in dirty else changes.deleted).add(key)
                 return False
     
     def _cleanup(self):
@@ -90,79 +332,158 @@ class StateManager:
     
     def __getitem__(self, key):
         """Allow dictionary-like access with square brackets: state['key']"""
-        with self._lock:
-            return self._state.get(key, None)
+        return self.get(key, None)
     
     def __setitem__(self, key, value):
         """Allow dictionary-like setting with square brackets: state['key'] = value"""
-        with self._lock:
-            self._state[key] = value
+        self.set(key, value)
     
     def __delitem__(self, key):
         """Allow dictionary-like deletion with: del state['key']"""
-        with self._lock:
-            if key in self._state:
-                del self._state[key]
+        self.pop(key, None)
     
     def __contains__(self, key):
         """Allow 'in' operator: 'key' in state"""
-        with self._lock:
-            return key in self._state
-    
+        return self.get(key, _MISSING) is not _MISSING
+
+    def _get(self, key):
+        value = self._backend.get(key, _MISSING)
+        return self._follow(self._load(key) if value is _MISSING else value)
+
+    def _follow(self, value):
+        """The value behind a link, _MISSING once the linked value was dropped or evicted."""
+        if isinstance(value, _Link):
+            target = value.target
+            value = self._backend.get(target, _MISSING)
+            if value is _MISSING:
+                value = self._load(target)
+        return value
+
     def get(self, key, default=None):
         """Get a value with a default if key doesn't exist"""
-        with self._lock:
-            return self._state.get(key, default)
+        scoped = self._scoped_key(key)
+        if scoped is not None:
+            value = self._get(scoped)
+            if value is not _MISSING:
+                return value
+        value = self._get(key)
+        return default if value is _MISSING else value
     
     def set(self, key, value):
         """Set a value for a key"""
-        with self._lock:
-            self._state[key] = value
-            return value  # Return value for convenience in chaining
+        scoped = self._scoped_key(key)
+        stored = value
+        if scoped is not None:
+            self._backend.set(scoped, value)
+            self._mark_set(scoped)
+            self._index(scoped, key)
+            stored = _Link(scoped)  # the global tier links to the thread's value instead of a second copy
+        self._backend.set(key, stored)
+        self._mark_set(key)
+        return value  # Return value for convenience in chaining
     
     def setdefault(self, key, default=None):
         """Set default value if key doesn't exist and return the value"""
-        with self._lock:
-            if key not in self._state:
-                self._state[key] = default
-            return self._state[key]
+        self._load(key)
+        value = self._backend.setdefault(key, default)
+        self._mark_set(key)
+        return value
     
+    def compare_and_set(self, key, expected, value):
+        """Atomically replace the value of ``key`` if it is still ``expected`` (the same object). Returns True on success."""
+        self._load(key)
+        swapped = self._backend.compare_and_set(key, expected, value)
+        if swapped:
+            self._mark_set(key)
+        return swapped
+
+    def get_or_compute(self, key, factory):
+        """Return the value of ``key``, calling ``factory()`` once to build it if it is missing."""
+        scoped = self._scoped_key(key)
+        if scoped is not None:
+            value = self._get(scoped)
+            if value is not _MISSING:
+                return value
+
+        def compute():
+            value = factory()
+            self._mark_set(key)
+            return value
+
+        value = self._load(key)
+        if value is _MISSING:
+            value = self._backend.get_or_compute(key, compute)
+        value = self._follow(value)
+        if value is _MISSING:  # linked to a value that is gone
+            value = factory()
+            self.set(key, value)
+        return value
+
     def update(self, **kwargs):
         """Update multiple state values at once with keyword arguments"""
-        with self._lock:
-            self._state.update(kwargs)
+        self._backend.update(kwargs)
+        for key in kwargs:
+            self._mark_set(key)
     
     def clear(self):
         """Clear all state values"""
         with self._lock:
-            self._state.clear()
+            keys = set(self._backend.keys()) | self._unloaded
+            self._backend.clear()
+            with self._namespace_lock:
+                for index in self._namespaces.values():
+                    index.clear()
+            for key in keys:
+                self._mark_deleted(key)
     
     def pop(self, key, default=None):
         """Remove a key and return its value, or default if key not found"""
-        with self._lock:
-            return self._state.pop(key, default)
+        scoped = self._scoped_key(key)
+        if scoped is not None:
+            # the global tier is shared with other threads, only its link to this thread's value goes
+            self._load(scoped)
+            value = self._backend.pop(scoped, default)
+            self._mark_deleted(scoped)
+            self._namespaces.get(_namespace.get(), {}).pop(scoped, None)
+            self._unlink(scoped, key)
+            return value
+        self._load(key)
+        value = self._follow(self._backend.pop(key, _MISSING))
+        self._mark_deleted(key)
+        return default if value is _MISSING else value
     
+    def __iter__(self):
+        """Iterate over the keys without copying the whole state, see iter_items"""
+        unloaded = set(self._unloaded)
+        for key in self._backend.iter_keys():
+            unloaded.discard(key)
+            yield key
+        yield from unloaded
+
+    def iter_items(self):
+        """Iterate over key-value pairs, weakly consistent: changes made meanwhile may or may not be seen"""
+        self._load_all()
+        for key, value in self._backend.iter_items():
+            value = self._follow(value)
+            if value is not _MISSING:
+                yield key, value
+
     def keys(self):
         """Return all keys in the state"""
-        with self._lock:
-            return list(self._state.keys())
+        return list(self)
     
     def values(self):
         """Return all values in the state"""
-        with self._lock:
-            return list(self._state.values())
+        return [value for _, value in self.iter_items()]
     
     def items(self):
         """Return all key-value pairs in the state"""
-        with self._lock:
-            return list(self._state.items())
+        return list(self.iter_items())
     
     def copy(self):
         """Return a copy of the state dictionary (thread-safe)"""
-        with self._lock:
-            return dict(self._state)
+        return dict(self.iter_items())
     
     def __repr__(self):
         """String representation of the state"""
-        with self._lock:
-            return f"StateManager({self._state})"
+        return f"StateManager({self._backend!r})"
\ No newline at end of file
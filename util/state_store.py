@@ -0,0 +1,144 @@
+import base64
+import hashlib
+import json
+import os
+import pickle
+import threading
+from typing import Any, Dict, Iterable, Tuple
+
+_INDEX = "index.log"
+
+
+def _encode_key(key) -> str:
+    """JSON-safe form of a key, strings stay readable in the index."""
+    if isinstance(key, str):
+        return "s:" + key
+    return "p:" + base64.b64encode(pickle.dumps(key, pickle.HIGHEST_PROTOCOL)).decode()
+
+
+def _decode_key(encoded: str):
+    if encoded.startswith("s:"):
+        return encoded[2:]
+    return pickle.loads(base64.b64decode(encoded[2:]))
+
+
+class KeyFileStore:
+    """
+    Key-per-file persistence for StateManager.
+
+    Every key is written to its own file, DataFrames as Parquet and anything
+    else pickled, so saving a change only rewrites the keys that changed. An
+    append-only ``index.log`` records sets and deletes; opening the store only
+    replays the index, values are read from disk when a key is first used.
+    The index is compacted once it holds many more records than live keys.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory: Folder for the index and value files, created if it does not exist
+        """
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[str, str]] = {}  # encoded key -> (file name, format)
+        self._records = 0
+        self._load_index()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load_index(self):
+        path = self._path(_INDEX)
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line after a crash
+                self._records += 1
+                if record["op"] == "set":
+                    self._entries[record["key"]] = (record["file"], record["format"])
+                else:
+                    self._entries.pop(record["key"], None)
+
+    def keys(self) -> list:
+        with self._lock:
+            return [_decode_key(encoded) for encoded in self._entries]
+
+    def load(self, key) -> Any:
+        """Read one value from disk, raises KeyError if the key was never saved."""
+        with self._lock:
+            name, fmt = self._entries[_encode_key(key)]
+        path = self._path(name)
+        if fmt == "parquet":
+            import pandas as pd
+
+            return pd.read_parquet(path)
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def _write_value(self, encoded: str, value) -> Tuple[str, str]:
+        stem = hashlib.sha1(encoded.encode()).hexdigest()
+        if hasattr(value, "to_parquet"):
+            try:
+                tmp = self._path(stem + ".parquet.tmp")
+                value.to_parquet(tmp)
+                os.replace(tmp, self._path(stem + ".parquet"))
+                return stem + ".parquet", "parquet"
+            except (ValueError, TypeError, ImportError):
+                # e.g. mixed-type object columns, stored pickled instead
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        tmp = self._path(stem + ".pickle.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._path(stem + ".pickle"))
+        return stem + ".pickle", "pickle"
+
+    def save(self, changed: Iterable[Tuple[Any, Any]], deleted: Iterable[Any] = ()):
+        """Write the changed keys and record the deleted ones, untouched keys are not rewritten."""
+        os.makedirs(self.directory, exist_ok=True)
+        records = []
+        for key, value in changed:
+            encoded = _encode_key(key)
+            name, fmt = self._write_value(encoded, value)
+            records.append({"op": "set", "key": encoded, "file": name, "format": fmt})
+        with self._lock:
+            known = set(self._entries)
+        for key in deleted:
+            if (encoded := _encode_key(key)) in known:
+                records.append({"op": "del", "key": encoded})
+        if not records:
+            return
+
+        with self._lock:
+            stale = []
+            for record in records:
+                previous = self._entries.get(record["key"])
+                if record["op"] == "set":
+                    self._entries[record["key"]] = (record["file"], record["format"])
+                    if previous and previous[0] != record["file"]:
+                        stale.append(previous[0])
+                elif self._entries.pop(record["key"], None):
+                    stale.append(previous[0])
+            with open(self._path(_INDEX), "a") as f:
+                f.writelines(json.dumps(record) + "\n" for record in records)
+            self._records += len(records)
+            if self._records > 2 * len(self._entries) + 64:
+                self._compact()
+        for name in stale:
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+
+    def _compact(self):
+        """Rewrite the index with one record per live key, called with the lock held."""
+        tmp = self._path(_INDEX + ".tmp")
+        with open(tmp, "w") as f:
+            for encoded, (name, fmt) in self._entries.items():
+                f.write(json.dumps({"op": "set", "key": encoded, "file": name, "format": fmt}) + "\n")
+        os.replace(tmp, self._path(_INDEX))
+        self._records = len(self._entries)